@@ -8,5 +8,5 @@ app = Flask(import_name=__name__)
 app.config.from_object(Config)
 db = SQLAlchemy(app)
 
-from app import routes
+from app import routes, commands
 from app.database import models
@@ -1,11 +1,111 @@
+import copy
+import dataclasses
+import hashlib
 import os
-from typing import List
+import threading
+from typing import Dict, List
 
 import gspread
-from flask import flash
+from google.auth.transport.requests import AuthorizedSession, Request
+from gspread.utils import convert_credentials, numericise_all
 from oauth2client.service_account import ServiceAccountCredentials
+from requests.adapters import HTTPAdapter
 
 from app import app
+from app.apputils import Const, Messages
+
+
+@dataclasses.dataclass
+class WsheetData:
+    header: List[str]  # first row as sent by the API
+    records: List[dict]  # rows after the firstrow first ones, as returned by get_all_records
+    firstrow: int = 0  # number of rows (header excluded) not read again
+    lastrecord: dict = None  # record of the row firstrow, i.e. the last row read before
+
+
+@dataclasses.dataclass
+class ApiStats:
+    clientcreations: int = 0
+    clientreuses: int = 0
+    tokenrefreshes: int = 0
+    requests: int = 0  # HTTP requests sent by the pooled connections
+    connections: int = 0  # HTTP connections opened
+
+    @property
+    def connectionreuses(self) -> int:
+        return self.requests - self.connections
+
+
+class TokenRequest(Request):
+    # transport used by the credentials to get a new OAuth token, counts the refreshes
+
+    def __call__(self, *args, **kwargs):
+        with ApiClient.lock:
+            ApiClient.stats.tokenrefreshes += 1
+        return super().__call__(*args, **kwargs)
+
+
+class TokenSession(AuthorizedSession):
+    # session shared by the sync threads : an expired token is fetched by one thread, the others wait and use it
+    def __init__(self, credentials, auth_request: Request):
+        super().__init__(credentials, auth_request=auth_request)
+        self.tokenrequest = auth_request
+        self.refreshlock = threading.Lock()
+
+    def request(self, method, url, *args, **kwargs):
+        if not self.credentials.valid:
+            with self.refreshlock:
+                if not self.credentials.valid:
+                    self.credentials.refresh(self.tokenrequest)
+        return super().request(method, url, *args, **kwargs)
+
+
+class ApiClient:
+    # One authorized client per process, shared by the requests and the sync threads.
+    # Its session keeps the connections alive and refreshes the token when it expires
+    lock = threading.Lock()
+    client = None
+    stats = ApiStats()
+
+    @classmethod
+    def getclient(cls) -> gspread.Client:
+        with cls.lock:
+            if cls.client is None:
+                cls.client = cls.createclient()
+                cls.stats.clientcreations += 1
+            else:
+                cls.stats.clientreuses += 1
+            return cls.client
+
+    @classmethod
+    def setclient(cls, client):
+        # replaces the process-wide client, e.g. by a local stand-in (see fakegspread), None to create it again
+        with cls.lock:
+            cls.client = client
+
+    @classmethod
+    def createclient(cls) -> gspread.Client:
+        projectpath, appdir = os.path.split(app.root_path)
+        credfile = os.path.join(projectpath, ApiAccess.CREDENTIALS_FILE)
+        creds = convert_credentials(ServiceAccountCredentials.from_json_keyfile_name(
+            filename=credfile, scopes=ApiAccess.API_SCOPE))
+        session = TokenSession(creds, auth_request=TokenRequest())
+        poolsize = max(app.config.get("SYNC_WORKERS", Const.DEFAULT_SYNC_WORKERS), 10)
+        session.mount("https://", HTTPAdapter(pool_maxsize=poolsize))
+        return gspread.Client(auth=creds, session=session)
+
+    @classmethod
+    def getstats(cls) -> ApiStats:
+        with cls.lock:
+            res = copy.copy(cls.stats)
+            session = getattr(cls.client, "session", None)  # a stand-in has no HTTP session
+            if session is not None:
+                for adapter in session.adapters.values():
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        res.requests += pools[key].num_requests
+                        res.connections += pools[key].num_connections
+        return res
 
 
 class ApiAccess:
@@ -19,19 +119,14 @@ class ApiAccess:
         self.client = None
 
     def initclient(self):
-        projectpath, appdir = os.path.split(app.root_path)
-        credfile = os.path.join(projectpath, self.CREDENTIALS_FILE)
-        creds = None
         try:
-            creds = ServiceAccountCredentials.from_json_keyfile_name(
-                filename=credfile, scopes=self.API_SCOPE)
+            self.client = ApiClient.getclient()
         except ValueError:
-            flash("Erreur : Type de credentials différent de `SERVICE_ACCOUNT`")
+            Messages.flash("Erreur : Type de credentials différent de `SERVICE_ACCOUNT`")
         except KeyError:
-            flash("Erreur : Erreur d'index lors de l'obtention de l'accès à l'API Google")
+            Messages.flash("Erreur : Erreur d'index lors de l'obtention de l'accès à l'API Google")
         except Exception as ex:
-            flash(f"Erreur : {ex}")
-        self.client = gspread.authorize(creds)
+            Messages.flash(f"Erreur : {ex}")
 
     def getfile(self, fileid: str) -> (bool, gspread.models.Spreadsheet):
         spreadsheet = None
@@ -40,9 +135,9 @@ class ApiAccess:
         try:
             spreadsheet = self.client.open_by_key(key=fileid)
         except gspread.exceptions.SpreadsheetNotFound:
-            flash(f"Erreur : Fichier id {fileid} non trouvé")
+            Messages.flash(f"Erreur : Fichier id {fileid} non trouvé")
         except Exception as ex:
-            flash(f"Erreur : {ex}")
+            Messages.flash(f"Erreur : {ex}")
         return spreadsheet
 
     @classmethod
@@ -51,19 +146,83 @@ class ApiAccess:
         try:
             metadata = spreadsheet.fetch_sheet_metadata()
         except PermissionError:
-            flash("Erreur : Accès refusé (absence du mail du credential dans les destinataires du partage ?)")
+            Messages.flash("Erreur : Accès refusé " +
+                           "(absence du mail du credential dans les destinataires du partage ?)")
         except Exception as ex:
-            flash(f"Erreur : {ex}")
+            Messages.flash(f"Erreur : {ex}")
         return metadata
 
+    # Thread safe fetches : errors are returned as messages, flashed by the thread of the database session
+
+    def fetchwsheets(self, fileid: str) -> (List[gspread.models.Worksheet], str):
+        wsheets = []
+        message = ""
+        try:
+            wsheets = self.client.open_by_key(key=fileid).worksheets()
+        except gspread.exceptions.SpreadsheetNotFound:
+            message = f"Erreur : Fichier id {fileid} non trouvé"
+        except Exception as ex:
+            message = f"Erreur : {ex}"
+        return wsheets, message
+
     @classmethod
-    def getwsheetdata(cls, wsheet: gspread.models.Worksheet) -> List[dict]:
-        res = []
-        if wsheet is not None:
+    def fetchwsheetsdata(cls, wsheets: List[gspread.models.Worksheet],
+                         lastrows: Dict[int, int] = None) -> (Dict[int, WsheetData], str):
+        # All the sheets (of a same spreadsheet) in one API call, data by sheet id
+        # lastrows gives by sheet id the number of rows already read : only the header, the last row read
+        # and the rows after it are then requested. If the sheet has less rows, it is read entirely
+        lastrows = dict() if lastrows is None else lastrows
+        res = dict()
+        message = ""
+        if wsheets:
+            spreadsheet = wsheets[0].spreadsheet
+            ranges = list()
+            firstrows = list()
+            for wsheet in wsheets:
+                firstrow = lastrows.get(wsheet.id, 0)
+                if firstrow <= 0 or firstrow + 1 > wsheet.row_count:
+                    firstrow = 0
+                    ranges.append(cls.rangename(wsheet.title))
+                else:
+                    ranges.append(cls.rangename(wsheet.title, firstrow=1, lastrow=1))
+                    ranges.append(cls.rangename(wsheet.title, firstrow=firstrow + 1, lastrow=wsheet.row_count))
+                firstrows.append(firstrow)
             try:
-                res = wsheet.get_all_records()
-            except IndexError:
-                flash(f"Erreur : Onglet {wsheet.title} du fichier {wsheet.spreadsheet.title} vide")
+                valueranges = spreadsheet.values_batch_get(ranges=ranges).get("valueRanges", [])
+                values = [valuerange.get("values", []) for valuerange in valueranges]
+                for wsheet, firstrow in zip(wsheets, firstrows):
+                    if firstrow == 0:
+                        rows = values.pop(0)
+                        header = rows[0] if rows else []
+                        res[wsheet.id] = WsheetData(header=header, records=cls.torecords(header, rows[1:]))
+                    else:
+                        headerrows = values.pop(0)
+                        rows = values.pop(0)
+                        header = headerrows[0] if headerrows else []
+                        records = cls.torecords(header, rows)
+                        res[wsheet.id] = WsheetData(header=header, records=records[1:], firstrow=firstrow,
+                                                    lastrecord=records[0] if records else None)
             except Exception as ex:
-                flash(f"Erreur : {ex}")
-        return res
\ No newline at end of file
+                message = f"Erreur : Lecture des onglets du fichier {spreadsheet.title}. Exception : {ex}"
+        return res, message
+
+    @classmethod
+    def rangename(cls, title: str, firstrow: int = None, lastrow: int = None) -> str:
+        # A1 notation for a whole sheet or for rows of a sheet, quotes in the title are doubled
+        res = "'{}'".format(title.replace("'", "''"))
+        if firstrow is not None:
+            res += f"!{firstrow}:{lastrow}"
+        return res
+
+    @classmethod
+    def torecords(cls, header: list, rows: List[list]) -> List[dict]:
+        # same records as gspread Worksheet.get_all_records : rows padded to the same width,
+        # numeric strings converted, one dict per row keyed by the header
+        width = max([len(header)] + [len(row) for row in rows])
+        keys = header + [""] * (width - len(header))
+        return [dict(zip(keys, numericise_all(row + [""] * (width - len(row)), empty2zero=False, default_blank="")))
+                for row in rows]
+
+    @classmethod
+    def hashheader(cls, header: list) -> str:
+        return hashlib.sha256("\t".join(str(text).strip() for text in header).encode("utf-8")).hexdigest()
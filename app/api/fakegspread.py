@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import gspread
+from gspread.utils import numericise_all
+
+
+class FakeStats:
+    # API calls by method, as many as HTTP requests the real client would send
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = Counter()
+
+    def count(self, method: str):
+        with self.lock:
+            self.calls[method] += 1
+
+    @property
+    def total(self) -> int:
+        with self.lock:
+            return sum(self.calls.values())
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", id: int, title: str, rows: List[list], extrarows: int = 0):
+        self.spreadsheet = spreadsheet
+        self.id = id
+        self.title = title
+        self.rows = rows  # header included, values as displayed (strings)
+        self.extrarows = extrarows  # empty rows at the end of the grid, as in a sheet created by a form
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows) + self.extrarows
+
+    @property
+    def col_count(self) -> int:
+        return max([len(row) for row in self.rows], default=0)
+
+    def get_all_values(self) -> List[list]:
+        self.spreadsheet.client.call("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def get_all_records(self, empty2zero=False, head=1, default_blank="") -> List[dict]:
+        self.spreadsheet.client.call("get_all_records")
+        header = self.rows[head - 1] if len(self.rows) >= head else []
+        return [dict(zip(header, numericise_all(row, empty2zero=empty2zero, default_blank=default_blank)))
+                for row in self.rows[head:]]
+
+
+class FakeSpreadsheet:
+    # A1 ranges of ApiAccess.rangename : 'title' or 'title'!first:last
+    RANGE_REGEX = re.compile(r"^'(?P<title>(?:[^']|'')*)'(?:!(?P<first>\d+):(?P<last>\d+))?$")
+
+    def __init__(self, client: "FakeClient", id: str, title: str, timezone: str = "Europe/Paris"):
+        self.client = client
+        self.id = id
+        self.title = title
+        self.timezone = timezone
+        self.wsheets = list()
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self.client.call("worksheets")
+        return list(self.wsheets)
+
+    def fetch_sheet_metadata(self) -> dict:
+        self.client.call("fetch_sheet_metadata")
+        return {"spreadsheetId": self.id,
+                "properties": {"title": self.title, "timeZone": self.timezone},
+                "sheets": [{"properties": {"sheetId": wsheet.id, "title": wsheet.title, "index": index,
+                                           "gridProperties": {"rowCount": wsheet.row_count,
+                                                              "columnCount": wsheet.col_count}}}
+                           for index, wsheet in enumerate(self.wsheets)]}
+
+    def values_batch_get(self, ranges: List[str], params: dict = None) -> dict:
+        # as the Sheets API : values of the rows in the range, empty trailing rows and cells left out
+        self.client.call("values_batch_get")
+        wsheetsdict = {wsheet.title: wsheet for wsheet in self.wsheets}
+        valueranges = list()
+        for rangename in ranges:
+            match = self.RANGE_REGEX.match(rangename)
+            if match is None or match.group("title").replace("''", "'") not in wsheetsdict:
+                raise gspread.exceptions.APIError(FakeResponse(400, f"Unable to parse range: {rangename}"))
+            wsheet = wsheetsdict[match.group("title").replace("''", "'")]
+            first = int(match.group("first") or 1)
+            last = int(match.group("last") or wsheet.row_count)
+            rows = [self.trimrow(row) for row in wsheet.rows[first - 1:last]]
+            while rows and not rows[-1]:
+                rows.pop()
+            valuerange = {"range": rangename, "majorDimension": "ROWS"}
+            if rows:
+                valuerange["values"] = rows
+            valueranges.append(valuerange)
+        return {"spreadsheetId": self.id, "valueRanges": valueranges}
+
+    @classmethod
+    def trimrow(cls, row: list) -> list:
+        res = [str(value) for value in row]
+        while res and res[-1] == "":
+            res.pop()
+        return res
+
+
+class FakeResponse:
+    # enough of requests.Response for gspread.exceptions.APIError
+    def __init__(self, status: int, message: str):
+        self.status_code = status
+        self.text = message
+
+    def json(self) -> dict:
+        return {"error": {"code": self.status_code, "message": self.text}}
+
+
+class FakeClient:
+    # Local stand-in for the gspread client used by ApiAccess (see ApiClient.setclient) :
+    # each call waits latency seconds, as a round trip to the Google API would
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.stats = FakeStats()
+        self.spreadsheets = dict()
+
+    def call(self, method: str):
+        self.stats.count(method)
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.call("open_by_key")
+        if key not in self.spreadsheets:
+            raise gspread.exceptions.SpreadsheetNotFound
+        return self.spreadsheets[key]
+
+    def addspreadsheet(self, key: str, title: str) -> FakeSpreadsheet:
+        spreadsheet = FakeSpreadsheet(client=self, id=key, title=title)
+        self.spreadsheets[key] = spreadsheet
+        return spreadsheet
+
+    def addworksheet(self, spreadsheet: FakeSpreadsheet, title: str, rows: List[list],
+                     extrarows: int = 0) -> FakeWorksheet:
+        sheetid = sum(len(other.wsheets) for other in self.spreadsheets.values()) + 1
+        wsheet = FakeWorksheet(spreadsheet=spreadsheet, id=sheetid, title=title, rows=rows, extrarows=extrarows)
+        spreadsheet.wsheets.append(wsheet)
+        return wsheet
+
+    @classmethod
+    def generate(cls, courses: int, tabs: int, rows: int, questions: int = 3, latency: float = 0.0,
+                 extrarows: int = 0) -> ("FakeClient", Dict[str, List[str]]):
+        # courses files of tabs forms, each answered by rows students. Returns the client and the
+        # students emails by file key, to create the matching courses
+        client = cls(latency=latency)
+        emailsdict = dict()
+        for coursenum in range(courses):
+            key = f"fake-file-{coursenum}"
+            spreadsheet = client.addspreadsheet(key=key, title=f"Réponses formation {coursenum}")
+            emails = [f"etudiant{studentnum}.formation{coursenum}@gmail.com" for studentnum in range(rows)]
+            emailsdict[key] = emails
+            for tabnum in range(tabs):
+                header = ["Horodateur", "Adresse e-mail"] + \
+                         [f"Question {questionnum} ?" for questionnum in range(questions)]
+                tabrows = [header]
+                for rownum, email in enumerate(emails):
+                    timestamp = datetime(2019, 1, 7) + timedelta(weeks=tabnum, minutes=rownum)
+                    answers = [str((rownum + questionnum) % 5 + 1) if questionnum % 2 == 0
+                               else f"Réponse {rownum} à la question {questionnum}"
+                               for questionnum in range(questions)]
+                    tabrows.append([timestamp.strftime("%d/%m/%Y %H:%M:%S"), email] + answers)
+                client.addworksheet(spreadsheet=spreadsheet, title=f"Semaine {tabnum + 1}", rows=tabrows,
+                                    extrarows=extrarows)
+        return client, emailsdict
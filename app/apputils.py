@@ -1,10 +1,16 @@
+import contextlib
 import dataclasses
 import math
+import multiprocessing
 import os
-from datetime import date, datetime, timedelta
-from typing import List, Union
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 
-from flask import session
+import flask
+import numpy as np
+from flask import has_request_context, session
 
 from app import app
 
@@ -14,12 +20,77 @@ class Const:
     DBFALSE = "N"
     DEFAULT_DAYS_TO_ENDDATE = 35
     DEFAULT_DAYS_UNCHANGED = 15
+    DEFAULT_SENTIMENT_WORKERS = os.cpu_count() or 1
+    DEFAULT_SYNC_WORKERS = 8
+    DEFAULT_GRAPH_CACHE_MAX_BYTES = 50 * 1024 * 1024
+    DEFAULT_GRAPH_WORKERS = os.cpu_count() or 1
+    DEFAULT_EXPORT_CHUNK_SIZE = 5000
+    DEFAULT_IMPORT_CHUNK_SIZE = 5000
+    DEFAULT_PAGE_SIZE = 50
+    DEFAULT_SEARCH_LIMIT = 20
+    MAX_GRADE_BINS = 100
     MAX_DAYS_SHEET_UNCHANGED = "MAX_DAYS_SHEET_UNCHANGED"
     MAX_DAYS_TO_ENDDATE = "MAX_DAYS_TO_ENDDATE"
     DASHBOARD_COURSE_IDS = "DASHBOARD_COURSE_IDS"
     DASHBOARD_STUDENT_IDS = "DASHBOARD_STUDENT_IDS"
     DASHBOARD_STARTDATE = "DASHBOARD_STARTDATE"
     DASHBOARD_ENDDATE = "DASHBOARD_ENDDATE"
+    RENDER_SERVER = "server"
+    RENDER_CLIENT = "client"
+
+
+class Messages:
+    # flash for the code run by requests and out of them (sync jobs, commands) : within Messages.collect(),
+    # the messages of the thread are appended to a list instead of the session
+    local = threading.local()
+
+    @classmethod
+    def flash(cls, message: str):
+        collected = getattr(cls.local, "messages", None)
+        if collected is not None:
+            collected.append(message)
+        elif has_request_context():
+            flask.flash(message)
+        else:
+            app.logger.info(message)
+
+    @classmethod
+    @contextlib.contextmanager
+    def collect(cls, messages: List[str] = None) -> Iterator[List[str]]:
+        previous = getattr(cls.local, "messages", None)
+        cls.local.messages = list() if messages is None else messages
+        try:
+            yield cls.local.messages
+        finally:
+            cls.local.messages = previous
+
+
+class ProcessPools:
+    # process pools shared by the requests of a process : created by the first parallel task and kept,
+    # the workers (and what their initializer loads) are started once instead of per request.
+    # One pool per name and size. Workers spawned, not forked : the pools are created by request threads,
+    # a fork would copy the locks held by the other threads
+    START_METHOD = "spawn"
+    lock = threading.Lock()
+    executors: Dict[Tuple[str, int], ProcessPoolExecutor] = dict()
+
+    @classmethod
+    def get(cls, name: str, workers: int, initializer: Callable = None) -> ProcessPoolExecutor:
+        with cls.lock:
+            executor = cls.executors.get((name, workers))
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                               mp_context=multiprocessing.get_context(cls.START_METHOD))
+                cls.executors[(name, workers)] = executor
+            return executor
+
+    @classmethod
+    def discard(cls, name: str, executor: ProcessPoolExecutor):
+        # broken pool (worker killed...) : the next task creates a new one
+        with cls.lock:
+            for key in [key for key, value in cls.executors.items() if key[0] == name and value is executor]:
+                del cls.executors[key]
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 @dataclasses.dataclass
@@ -44,6 +115,11 @@ class DTime:
     def max(cls) -> datetime:
         return datetime(year=2100, month=1, day=1)
 
+    @classmethod
+    def utcnow(cls) -> datetime:
+        # naive UTC, as the answers timestamps
+        return datetime.now(tz=timezone.utc).replace(tzinfo=None)
+
     @classmethod
     def timedelta2days(cls, delta: timedelta) -> int:
         res = 0
@@ -79,25 +155,65 @@ class DTime:
         return res
 
 
-class FileUtils:
-
-    # https://stackabuse.com/python-list-files-in-a-directory/
-    @classmethod
-    def deletefiles(cls, prefix: str, suffix: str):
-        with os.scandir(app.static_folder) as entries:
-            for entry in entries:
-                if entry.is_file():
-                    if entry.name.startswith(prefix) and not entry.name.endswith(suffix):
-                        os.remove(os.path.join(app.static_folder, entry.name))
-
-
 @dataclasses.dataclass
 class NumAnswer:
+    # grades of a question stored as a histogram : counts[i] answers with the grade grades[i].
+    # Memory depends on the grading scale, not on the number of answers
     questiontext: str
-    grades: List[int]
-    max: int
-    count: int
-    average: float
+    grades: np.ndarray  # distinct grades, sorted, int64 (years, postcodes... are integer answers too)
+    counts: np.ndarray  # number of answers per grade, int64
+
+    @classmethod
+    def fromhistogram(cls, questiontext: str, histogram: Dict[int, int]) -> "NumAnswer":
+        grades = np.array(sorted(histogram.keys()), dtype=np.int64)
+        counts = np.array([histogram[grade] for grade in grades.tolist()], dtype=np.int64)
+        return cls(questiontext=questiontext, grades=grades, counts=counts)
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def max(self) -> int:
+        return int(self.grades.max()) if self.count > 0 else 0
+
+    @property
+    def min(self) -> int:
+        return int(self.grades.min()) if self.count > 0 else 0
+
+    @property
+    def average(self) -> float:
+        return float(np.average(self.grades, weights=self.counts)) if self.count > 0 else math.nan
+
+    @property
+    def std(self) -> float:
+        # population standard deviation, as numpy.std
+        if self.count == 0:
+            return math.nan
+        return float(np.sqrt(np.average((self.grades - self.average) ** 2, weights=self.counts)))
+
+    @property
+    def median(self) -> float:
+        return self.percentiles([50])[0]
+
+    def percentiles(self, qs: List[float]) -> List[float]:
+        # linear interpolation between ranks, as numpy.percentile on the individual grades
+        if self.count == 0:
+            return [math.nan] * len(qs)
+        ranks = np.asarray(qs, dtype=np.float64) / 100 * (self.count - 1)
+        cumcounts = np.cumsum(self.counts)
+        lows = self.grades[np.searchsorted(cumcounts, np.floor(ranks), side="right")]
+        highs = self.grades[np.searchsorted(cumcounts, np.ceil(ranks), side="right")]
+        return (lows + (highs - lows) * (ranks - np.floor(ranks))).tolist()
+
+    def histogram(self, first: int = 0, last: int = None) -> np.ndarray:
+        # number of answers for each grade from first to last, grades outside are ignored
+        if last is None:
+            last = max(self.max, first)
+        res = np.zeros(last - first + 1, dtype=np.int64)
+        inside = (self.grades >= first) & (self.grades <= last)
+        res[self.grades[inside] - first] = self.counts[inside]
+        return res
 
 
 @dataclasses.dataclass
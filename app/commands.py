@@ -0,0 +1,52 @@
+import click
+
+from app import app, db
+from app.apputils import Messages
+from app.database.dbutils import Db, DbForm, DbFormStat
+from app.database.models import Course, FormStat
+
+
+@app.cli.command("upgrade-db")
+def upgradedb():
+    """Create the missing tables, columns and indexes of an existing database"""
+    messages = Db.upgrade()
+    for message in messages:
+        print(message)
+    errors = [message for message in messages if message.startswith("Erreur")]
+    if errors:
+        # the application cannot write to a database missing a unique key
+        raise click.ClickException(f"Mise à jour de la base incomplète ({len(errors)} erreur(s))")
+    print(f"Base à jour ({len(messages)} modification(s))")
+
+
+@app.cli.command("rebuild-stats")
+def rebuildstats():
+    """Compute again the statistics of every form from its answers"""
+    try:
+        DbFormStat.rebuild()
+        db.session.commit()
+    except Exception as ex:
+        db.session.rollback()
+        raise click.ClickException(f"Echec du calcul des statistiques. Exception : {ex}")
+    print(f"Statistiques calculées ({db.session.query(FormStat).count()} question(s) d'onglets)")
+
+
+@app.cli.command("import-sheets")
+@click.argument("courseid", type=int)
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def importsheets(courseid: int, paths: tuple):
+    """Import the answers of a course from local exports of its responses file (CSV per tab or XLSX)"""
+    course = db.session.query(Course).get(courseid)
+    if course is None:
+        raise click.ClickException(f"Formation {courseid} inconnue")
+    success = True
+    for path in paths:
+        # no request here : the flashed messages are collected and printed after each file
+        with Messages.collect() as messages:
+            for report in DbForm.importfile(course=course, path=path):
+                success = success and report.success
+                print(report.message)
+        for message in messages:
+            print(message)
+    if not success:
+        raise SystemExit(1)
@@ -1,19 +1,23 @@
 import dataclasses
-import math
-from datetime import date, datetime, timedelta
-from typing import List
+import time
+import zoneinfo
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
 import gspread
-from flask import flash
-from sqlalchemy import func
-from sqlalchemy.orm import Query
-from textblob import TextBlob
-from textblob_fr import PatternTagger, PatternAnalyzer
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query, joinedload
 
-from app import db
-from app.api.apiutils import ApiAccess
-from app.apputils import Const, NumAnswer, Params, DTime, TextAnswer
-from app.database.models import Course, Student, Form, Question, Answer
+from app import app, db
+from app.api.apiutils import ApiAccess, WsheetData
+from app.apputils import Const, Messages, NumAnswer, Params, DTime, TextAnswer
+from app.database.models import Course, Student, Form, Question, Answer, FormStat, Sentiment
+from app.imports.importutils import SheetFile, SheetFiles, SheetFrame
+from app.nlp.nlputils import SentimentAnalyzer
 
 
 @dataclasses.dataclass
@@ -34,6 +38,17 @@ class FormSummary:
     answerscount: int = 0
 
 
+@dataclasses.dataclass
+class SheetReport:
+    courselabel: str
+    sheetlabel: str = ""
+    skipped: bool = False  # unchanged for too long
+    success: bool = False
+    rowscount: int = 0
+    seconds: float = 0.0  # Google API fetch time (all the file's sheets), or file import time
+    message: str = ""
+
+
 class Db:
 
     @classmethod
@@ -44,6 +59,85 @@ class Db:
             coursecount = -1
         return coursecount >= 0
 
+    @classmethod
+    def upgrade(cls) -> List[str]:
+        # db.create_all() creates the missing tables only, the missing columns, unique constraints
+        # and indexes are added here (no migrations, see README)
+        messages = list()
+        rebuildstats = False
+        inspector = db.inspect(db.engine)
+        newtables = [table.name for table in db.metadata.sorted_tables if not inspector.has_table(table.name)]
+        db.create_all()
+        inspector = db.inspect(db.engine)
+        preparer = db.engine.dialect.identifier_preparer
+        for table in db.metadata.sorted_tables:
+            columnnames = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columnnames:
+                    ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN " + \
+                          f"{preparer.format_column(column)} {column.type.compile(dialect=db.engine.dialect)}"
+                    if column.server_default is not None:
+                        ddl += f" DEFAULT {column.server_default.arg}"
+                        if not column.nullable:
+                            ddl += " NOT NULL"
+                    db.session.execute(db.text(ddl))
+                    messages.append(f"Colonne {table.name}.{column.name} ajoutée")
+            db.session.commit()
+            # a unique constraint cannot be added to an existing SQLite table, a unique index does the same
+            uniquecolumns = [set(constraint["column_names"])
+                             for constraint in inspector.get_unique_constraints(table.name)]
+            uniquecolumns += [set(index["column_names"])
+                              for index in inspector.get_indexes(table.name) if index["unique"]]
+            for constraint in table.constraints:
+                if isinstance(constraint, db.UniqueConstraint) and \
+                        {column.name for column in constraint.columns} not in uniquecolumns:
+                    # a column unique=True gives an unnamed constraint
+                    name = constraint.name or \
+                        f"uq_{table.name.lower()}_{'_'.join(column.name for column in constraint.columns)}"
+                    columns = ", ".join(preparer.format_column(column) for column in constraint.columns)
+                    ddl = f"CREATE UNIQUE INDEX {preparer.quote(name)} ON {preparer.format_table(table)} ({columns})"
+                    try:
+                        duplicates = 0
+                        if table.name == Answer.__tablename__:
+                            # a student answering a sheet twice : the latest answer replaces the former ones
+                            duplicates = cls.deleteduplicates(table=table, columns=list(constraint.columns))
+                        db.session.execute(db.text(ddl))
+                        db.session.commit()
+                        if duplicates > 0:
+                            rebuildstats = True
+                            messages.append(f"Réponses en double supprimées : {duplicates} (dernière gardée)")
+                        messages.append(f"Index unique {name} ajouté")
+                    except Exception as ex:
+                        db.session.rollback()
+                        messages.append(f"Erreur : Index unique {name} non créé (doublons ?). Exception : {ex}")
+            indexnames = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexnames:
+                    index.create(bind=db.engine)
+                    messages.append(f"Index {index.name} ajouté")
+        db.session.commit()
+        if FormStat.__tablename__ in newtables or rebuildstats:
+            # statistics of the answers already there
+            DbFormStat.rebuild()
+            db.session.commit()
+            messages.append("Statistiques des onglets calculées")
+        return messages
+
+    @classmethod
+    def deleteduplicates(cls, table: db.Table, columns: List[db.Column]) -> int:
+        # rows sharing the values of columns, the one of highest id kept
+        primarykey = table.primary_key.columns[0]
+        latestids = db.select(func.max(primarykey)).group_by(*columns)
+        return db.session.execute(table.delete().where(primarykey.not_in(latestids))).rowcount
+
+    @classmethod
+    def pagesize(cls) -> int:
+        return app.config.get("PAGE_SIZE", Const.DEFAULT_PAGE_SIZE)
+
+    @classmethod
+    def searchlimit(cls) -> int:
+        return app.config.get("SEARCH_LIMIT", Const.DEFAULT_SEARCH_LIMIT)
+
 
 class DbCourse:
 
@@ -56,7 +150,7 @@ class DbCourse:
                 Course.startdate <= datetime.now()
             ).order_by(Course.startdate)
         except Exception as ex:
-            flash(f"Erreur : {ex}")
+            Messages.flash(f"Erreur : {ex}")
         return courses
 
     @classmethod
@@ -66,26 +160,29 @@ class DbCourse:
         limitdate = DTime.min() if minenddate is None else minenddate
         courses = None
         try:
-            courses = db.session.query(Course).order_by(Course.id)
+            # forms dates and counts aggregated by course in SQL
+            formsstats = db.session.query(
+                Form.course_id,
+                func.count(Form.id).label("formscount"),
+                func.max(Form.lastentrydt).label("lastentrydt"),
+                func.max(Form.lastreaddt).label("lastreaddt")
+            ).group_by(Form.course_id).subquery()
+            courses = db.session.query(
+                Course, formsstats.c.formscount, formsstats.c.lastentrydt, formsstats.c.lastreaddt
+            ).outerjoin(
+                formsstats, formsstats.c.course_id == Course.id
+            ).order_by(Course.id).all()
         except Exception as ex:
-            flash(f"Erreur : {ex}")
+            Messages.flash(f"Erreur : {ex}")
         if courses is not None:
-            for course in courses:
+            for course, formscount, lastentrydt, lastreaddt in courses:
                 check = (course.enddate > limitdate) and (course.startdate <= today)
-                formscount = len(course.forms)
-                lastentrydt = DTime.min()
-                lastreaddt = DTime.min()
-                for form in course.forms:
-                    if form.lastentrydt and form.lastentrydt > lastentrydt:
-                        lastentrydt = form.lastentrydt
-                    if form.lastreaddt and form.lastreaddt > lastreaddt:
-                        lastreaddt = form.lastreaddt
                 newcourse = CourseSummary(
                     check=check,
                     course=course,
-                    formscount=formscount,
-                    lastentrydt=lastentrydt,
-                    lastreaddt=lastreaddt
+                    formscount=formscount or 0,
+                    lastentrydt=max(lastentrydt or DTime.min(), DTime.min()),
+                    lastreaddt=max(lastreaddt or DTime.min(), DTime.min())
                 )
                 res.append(newcourse)
             res.sort(key=(lambda c: (1 - int(c.check), -c.formscount, c.course.id)))
@@ -148,7 +245,7 @@ class DbCourse:
             try:
                 coursetodel = db.session.query(Course).get(int(courseid))
             except Exception as ex:
-                flash(f"Erreur : {ex}")
+                Messages.flash(f"Erreur : {ex}")
             success = (coursetodel is not None)
             message = "Erreur : Formation inexistante" if not success else ""
         if success:
@@ -171,6 +268,39 @@ class DbCourse:
                 message = str(ex)
         return success, message
 
+    @classmethod
+    def querypage(cls, after: str, size: int) -> Tuple[List[Course], str]:
+        # keyset pagination on (startdate, id) : after is the key of the last course of the previous page,
+        # the key of the last course of this page is returned (None on the last page)
+        courses = db.session.query(Course)
+        try:
+            startdate, courseid = after.split("-")
+            startdate, courseid = datetime.strptime(startdate, "%Y%m%d%H%M%S"), int(courseid)
+            courses = courses.filter(or_(Course.startdate > startdate,
+                                         and_(Course.startdate == startdate, Course.id > courseid)))
+        except (AttributeError, ValueError):
+            pass  # first page
+        courses = courses.order_by(Course.startdate, Course.id).limit(size + 1).all()
+        nextafter = None
+        if len(courses) > size:
+            courses = courses[:size]
+            nextafter = f"{courses[-1].startdate:%Y%m%d%H%M%S}-{courses[-1].id}"
+        return courses, nextafter
+
+    @classmethod
+    def querybyids(cls, ids: List[str]) -> List[Course]:
+        ids = [int(courseid) for courseid in ids if str(courseid).isnumeric()]
+        return db.session.query(Course).filter(Course.id.in_(ids)).order_by(Course.id).all() if ids else []
+
+    @classmethod
+    def search(cls, text: str, limit: int) -> List[Course]:
+        # courses whose label or file name contain every word of the text, for the pickers
+        courses = db.session.query(Course)
+        for word in text.split():
+            courses = courses.filter(or_(Course.label.icontains(word, autoescape=True),
+                                         Course.filename.icontains(word, autoescape=True)))
+        return courses.order_by(Course.startdate.desc(), Course.id).limit(limit).all()
+
 
 class DbStudent:
 
@@ -227,6 +357,41 @@ class DbStudent:
                 message = str(ex)
         return success, message
 
+    @classmethod
+    def querypage(cls, after: str, size: int) -> Tuple[List[Student], str]:
+        # keyset pagination on (course_id, id), as DbCourse.querypage, courses loaded in the same query
+        students = db.session.query(Student).options(joinedload(Student.course))
+        try:
+            courseid, studentid = [int(key) for key in after.split("-")]
+            students = students.filter(or_(Student.course_id > courseid,
+                                           and_(Student.course_id == courseid, Student.id > studentid)))
+        except (AttributeError, ValueError):
+            pass  # first page
+        students = students.order_by(Student.course_id, Student.id).limit(size + 1).all()
+        nextafter = None
+        if len(students) > size:
+            students = students[:size]
+            nextafter = f"{students[-1].course_id}-{students[-1].id}"
+        return students, nextafter
+
+    @classmethod
+    def querybyids(cls, ids: List[str]) -> List[Student]:
+        ids = [int(studentid) for studentid in ids if str(studentid).isnumeric()]
+        if not ids:
+            return []
+        return db.session.query(Student).options(joinedload(Student.course)).filter(
+            Student.id.in_(ids)).order_by(Student.id).all()
+
+    @classmethod
+    def search(cls, text: str, limit: int) -> List[Student]:
+        # students whose names or email contain every word of the text, for the pickers
+        students = db.session.query(Student).options(joinedload(Student.course))
+        for word in text.split():
+            students = students.filter(or_(Student.lastname.icontains(word, autoescape=True),
+                                           Student.firstname.icontains(word, autoescape=True),
+                                           Student.email.icontains(word, autoescape=True)))
+        return students.order_by(Student.lastname, Student.firstname, Student.id).limit(limit).all()
+
 
 class DbForm:
 
@@ -234,40 +399,53 @@ class DbForm:
     def queryforms(cls, minenddate: datetime, daysnochange: int) -> List:
         res = []
         limitdate = DTime.min() if minenddate is None else minenddate
-        courses = None
+        forms = None
         try:
-            courses = db.session.query(Course).filter(
+            # forms counts aggregated in SQL, respondents counts read from the forms statistics
+            # (each row of a sheet answers every question)
+            formscounts = db.session.query(
+                Form.course_id,
+                func.count(Form.id).label("formscount")
+            ).group_by(Form.course_id).subquery()
+            answerscounts = db.session.query(
+                FormStat.form_id,
+                func.max(FormStat.answerscount).label("answerscount")
+            ).group_by(FormStat.form_id).subquery()
+            forms = db.session.query(
+                Course, Form, formscounts.c.formscount, answerscounts.c.answerscount
+            ).outerjoin(
+                Form, Form.course_id == Course.id
+            ).outerjoin(
+                formscounts, formscounts.c.course_id == Course.id
+            ).outerjoin(
+                answerscounts, answerscounts.c.form_id == Form.id
+            ).filter(
                 Course.filename != "",
                 Course.enddate > limitdate,
                 Course.startdate <= datetime.now()
-            ).order_by(Course.id)
+            ).order_by(Course.id, Form.id).all()
         except Exception as ex:
-            flash(f"Erreur : {ex}")
-        if courses is not None:
-            for course in courses:
-                formscount = len(course.forms)
-                if formscount == 0:
+            Messages.flash(f"Erreur : {ex}")
+        if forms is not None:
+            for course, form, formscount, answerscount in forms:
+                if form is None:
                     newform = FormSummary(
                         check=True,
                         course=course,
-                        formscount=formscount
+                        formscount=0
                     )
-                    res.append(newform)
                 else:
-                    for form in course.forms:
-                        check = (form.lastentrydt is None) or (form.lastreaddt is None)
-                        if not check:
-                            check = (DTime.timedelta2days(form.lastreaddt - form.lastentrydt) <= daysnochange)
-                        studentsdict = {answer.student_id: 1 for answer in form.answers}
-                        answerscount = len(studentsdict.keys())
-                        newform = FormSummary(
-                            check=check,
-                            course=course,
-                            formscount=formscount,
-                            form=form,
-                            answerscount=answerscount
-                        )
-                        res.append(newform)
+                    check = (form.lastentrydt is None) or (form.lastreaddt is None)
+                    if not check:
+                        check = (DTime.timedelta2days(form.lastreaddt - form.lastentrydt) <= daysnochange)
+                    newform = FormSummary(
+                        check=check,
+                        course=course,
+                        formscount=formscount,
+                        form=form,
+                        answerscount=answerscount or 0
+                    )
+                res.append(newform)
             res.sort(key=(lambda f: (1 - int(f.check), -f.formscount, f.course.id)))
         return res
 
@@ -277,24 +455,24 @@ class DbForm:
         if wsheet is not None:
             newform = Form(sheetid=wsheet.id,
                            sheetlabel=wsheet.title,
-                           lastentrydt=datetime.now(tz=None),  # default before reading answers
-                           lastreaddt=datetime.now(tz=None),
+                           lastentrydt=DTime.utcnow(),  # default before reading answers
+                           lastreaddt=DTime.utcnow(),
                            course_id=course.id)
             try:
                 db.session.add(newform)
                 db.session.commit()
                 success = True
-                flash(f"Succès: Onglet {wsheet.title} ajouté en base (formation {course.label}, " +
-                      f"fichier {course.filename})")
+                Messages.flash(f"Succès: Onglet {wsheet.title} ajouté en base (formation {course.label}, " +
+                               f"fichier {course.filename})")
             except Exception as ex:
                 db.session.rollback()
-                flash(f"Erreur: Echec de l'ajout de l'onglet {wsheet.title} en base (formation " +
-                      f"{course.label}, fichier {course.filename}). Exception : {ex}")
+                Messages.flash(f"Erreur: Echec de l'ajout de l'onglet {wsheet.title} en base (formation " +
+                               f"{course.label}, fichier {course.filename}). Exception : {ex}")
                 success = False
         return success
 
     @classmethod
-    def updatedates(cls, gform: Form) -> bool:
+    def setdates(cls, gform: Form):
         lastentrydt = None
         try:
             lastentrydt = db.session.query(
@@ -303,230 +481,708 @@ class DbForm:
                 Answer.form_id == gform.id
             ).group_by(Answer.form_id).first()
         except Exception as ex:
-            flash(f"Erreur : {ex}")
+            Messages.flash(f"Erreur : {ex}")
         if lastentrydt is not None:
             gform.lastentrydt = lastentrydt[0]
-        gform.lastreaddt = datetime.now(tz=None)
+        gform.lastreaddt = DTime.utcnow()
+
+    @classmethod
+    def updatedates(cls, gform: Form) -> bool:
+        cls.setdates(gform=gform)
         try:
             db.session.commit()
             success = True
         except Exception as ex:
             db.session.rollback()
             success = False
-            flash(f"Erreur : Echec de mise à jour des dates du formulaire (formation {gform.course.label}, " +
-                  f"fichier {gform.course.filename}, onglet {gform.sheetlabel})")
+            Messages.flash(f"Erreur : Echec de mise à jour des dates du formulaire (formation {gform.course.label}, " +
+                           f"fichier {gform.course.filename}, onglet {gform.sheetlabel})")
         return success
 
     @classmethod
-    def updateall(cls, minenddate: datetime, daysnochange: int) -> bool:
+    def updateall(cls, minenddate: datetime, daysnochange: int,
+                  reports: List[SheetReport] = None) -> (bool, List[SheetReport]):
+        # reports, if given, is filled while sheets are read (progress of a background sync)
+        reports = list() if reports is None else reports
         success = (minenddate is not None)
         if not success:
-            flash("Erreur : Aucune date de fin de formation définie")
+            Messages.flash("Erreur : Aucune date de fin de formation définie")
         if success:
             success = (daysnochange >= 0)
             if not success:
-                flash("Erreur : Aucun délai de stabilité défini pour les onglets à ignorer")
+                Messages.flash("Erreur : Aucun délai de stabilité défini pour les onglets à ignorer")
         if success:
             courses_list = DbCourse.querycurrent(minenddate=minenddate)
             apiaccess = ApiAccess()
-            for course in courses_list:
-                file = apiaccess.getfile(fileid=course.fileid)
-                if file is None:
-                    flash(f"Erreur : Fichier {course.label} non trouvé")
-                else:
-                    wsheets = file.worksheets()
-                    for wsheet in wsheets:
-                        success = cls.update(course=course, daysnochange=daysnochange, wsheet=wsheet)
-                        success = True  # there might be success with other sheets / files
+            apiaccess.initclient()
+            # Google API calls run in worker threads, database reads and writes stay in this thread
+            # (the request session) and are done as soon as a file or a sheet has been fetched
+            workers = app.config.get("SYNC_WORKERS", Const.DEFAULT_SYNC_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = {executor.submit(apiaccess.fetchwsheets, course.fileid): (course, None)
+                           for course in courses_list}
+                while pending:
+                    done, notdone = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        course, sheetslist = pending.pop(future)
+                        if sheetslist is None:
+                            # file fetched : fetch all the sheets to update in one call
+                            wsheets, message = future.result()
+                            if message:
+                                Messages.flash(message)
+                                reports.append(SheetReport(courselabel=course.label, message=message))
+                            sheetslist = list()
+                            for wsheet in wsheets:
+                                gform = cls.getform(course=course, wsheet=wsheet)
+                                if gform is not None:
+                                    report = SheetReport(courselabel=course.label, sheetlabel=gform.sheetlabel)
+                                    reports.append(report)
+                                    if gform.lastentrydt >= gform.lastreaddt - timedelta(days=daysnochange):
+                                        sheetslist.append((wsheet, gform, report))
+                                    else:
+                                        report.skipped = True
+                                        report.success = True
+                            if sheetslist:
+                                future = cls.submitfetch(executor=executor, sheetslist=sheetslist, incremental=True)
+                                pending[future] = (course, sheetslist)
+                        else:
+                            # sheets fetched : update answers, read again entirely the sheets changed before
+                            # the last row read
+                            wsheetsdata, message, seconds = future.result()
+                            if message:
+                                Messages.flash(message)
+                            rescanlist = list()
+                            for wsheet, gform, report in sheetslist:
+                                wsheetdata = wsheetsdata.get(wsheet.id)
+                                report.seconds += seconds
+                                if message or wsheetdata is None:
+                                    report.message = message
+                                elif not cls.checklastrow(gform=gform, wsheetdata=wsheetdata):
+                                    rescanlist.append((wsheet, gform, report))
+                                else:
+                                    report.rowscount = len(wsheetdata.records)
+                                    report.success = cls.update(course=course, gform=gform, wsheetdata=wsheetdata)
+                            if rescanlist:
+                                future = cls.submitfetch(executor=executor, sheetslist=rescanlist, incremental=False)
+                                pending[future] = (course, rescanlist)
+        return success, reports  # there might be success with other sheets / files
+
+    @classmethod
+    def submitfetch(cls, executor: ThreadPoolExecutor, sheetslist: list, incremental: bool) -> Future:
+        wsheets = [wsheet for wsheet, gform, report in sheetslist]
+        lastrows = {wsheet.id: gform.lastrowindex for wsheet, gform, report in sheetslist} if incremental else None
+        return executor.submit(cls.fetchwsheetsdata, wsheets, lastrows)
+
+    @classmethod
+    def fetchwsheetsdata(cls, wsheets: List[gspread.models.Worksheet],
+                         lastrows: Dict[int, int]) -> (Dict[int, WsheetData], str, float):
+        starttime = time.perf_counter()
+        wsheetsdata, message = ApiAccess.fetchwsheetsdata(wsheets=wsheets, lastrows=lastrows)
+        return wsheetsdata, message, time.perf_counter() - starttime
+
+    @classmethod
+    def checklastrow(cls, gform: Form, wsheetdata: WsheetData) -> bool:
+        # rows read after the high-water mark are usable if the header and the last row read are unchanged
+        success = (wsheetdata.firstrow == 0)
+        if not success and wsheetdata.lastrecord is not None and \
+                ApiAccess.hashheader(wsheetdata.header) == gform.headerhash:
+            lastrowdt = DbAnswer.parsetimestamp(wsheetdata.lastrecord.get(ApiAccess.TIMESTAMP_HEADER, ""),
+                                                tzname=gform.course.filetz)
+            success = (lastrowdt is not None and lastrowdt == gform.lastrowdt)
         return success
 
     @classmethod
-    def update(cls, course: Course, daysnochange: int, wsheet: gspread.Worksheet) -> bool:
+    def getform(cls, course: Course, wsheet: gspread.models.Worksheet) -> Form:
         gformsdict = {gform.sheetid: gform for gform in course.forms}
-        success = (wsheet.id in gformsdict)
-        if not success:
-            success = cls.createfromsheet(course=course, wsheet=wsheet)
-        if success:
+        if wsheet.id not in gformsdict:
+            cls.adoptimportform(course=course, wsheet=wsheet)
             gformsdict = {gform.sheetid: gform for gform in course.forms}
-            gform = gformsdict[wsheet.id]
-            if gform.lastentrydt >= gform.lastreaddt - timedelta(days=daysnochange):
-                wsheetdata = ApiAccess.getwsheetdata(wsheet)
-                if wsheetdata:
-                    DbQuestion.createfromsheet(course=course, wsheetdata=wsheetdata)
-                    success = DbAnswer.updatefromsheet(gform=gform, wsheetdata=wsheetdata)
-                    if success:
-                        try:
-                            db.session.commit()
-                            success = True
-                            flash(f"Succès : Réponses mises à jour (formation {course.label}, " +
-                                  f"fichier {course.filename}, onglet {gform.sheetlabel})")
-                        except Exception as ex:
-                            db.session.rollback()
-                            success = False
-                            flash(f"Erreur : Echec de la mise à jour des réponses (formation {course.label}, " +
-                                  f"fichier {course.filename}, onglet {gform.sheetlabel})")
-                        if success:
-                            success = cls.updatedates(gform=gform)
+        if wsheet.id not in gformsdict:
+            if cls.createfromsheet(course=course, wsheet=wsheet):
+                gformsdict = {gform.sheetid: gform for gform in course.forms}
+        return gformsdict.get(wsheet.id)
+
+    @classmethod
+    def update(cls, course: Course, gform: Form, wsheetdata: WsheetData) -> bool:
+        success = True
+        records = wsheetdata.records
+        skippedrows = list()
+        if records:
+            sheetframe = SheetFrame.fromrecords(records)
+            DbQuestion.createfromsheet(course=course, sheetframe=sheetframe)
+            success = DbAnswer.updatefromsheet(gform=gform, sheetframe=sheetframe, skippedrows=skippedrows)
+            if success:
+                try:
+                    db.session.commit()
+                    success = True
+                    Messages.flash(f"Succès : Réponses mises à jour (formation {course.label}, " +
+                                   f"fichier {course.filename}, onglet {gform.sheetlabel})")
+                except Exception as ex:
+                    db.session.rollback()
+                    success = False
+                    Messages.flash(f"Erreur : Echec de la mise à jour des réponses (formation {course.label}, " +
+                                   f"fichier {course.filename}, onglet {gform.sheetlabel})")
+        if success:
+            # move the high-water mark up to the first row ignored : read again until its student is known
+            readcount = min(skippedrows, default=len(records))
+            gform.lastrowindex = wsheetdata.firstrow + readcount
+            if readcount > 0:
+                gform.lastrowdt = DbAnswer.parsetimestamp(records[readcount - 1].get(ApiAccess.TIMESTAMP_HEADER, ""),
+                                                          tzname=course.filetz)
+            gform.headerhash = ApiAccess.hashheader(wsheetdata.header)
+            success = cls.updatedates(gform=gform)
         return success
 
+    @classmethod
+    def adoptimportform(cls, course: Course, wsheet: gspread.models.Worksheet):
+        # a form created by a file import (no sheet id, see getimportform) gets the id of its sheet
+        for gform in course.forms:
+            if gform.sheetid < 0 and gform.sheetlabel.strip() == wsheet.title.strip():
+                try:
+                    gform.sheetid = wsheet.id
+                    db.session.commit()
+                except Exception as ex:
+                    db.session.rollback()
+                    Messages.flash(f"Erreur : Echec du rattachement de l'onglet {wsheet.title} importé (formation " +
+                                   f"{course.label}, fichier {course.filename}). Exception : {ex}")
+                break
+
+    @classmethod
+    def getimportform(cls, course: Course, sheetlabel: str) -> Form:
+        # form of a tab imported from a file, matched by its label. A new form gets a negative sheet id
+        # until the first synchronization through the API, see adoptimportform
+        for gform in course.forms:
+            if gform.sheetlabel.strip() == sheetlabel.strip():
+                return gform
+        minsheetid = db.session.query(func.min(Form.sheetid)).scalar()
+        newform = Form(sheetid=min(minsheetid or 0, 0) - 1,
+                       sheetlabel=sheetlabel,
+                       lastentrydt=DTime.utcnow(),  # default before reading answers
+                       lastreaddt=DTime.utcnow(),
+                       course_id=course.id)
+        course.forms.append(newform)
+        db.session.flush()
+        return newform
+
+    @classmethod
+    def importfile(cls, course: Course, path: str) -> List[SheetReport]:
+        # a CSV or XLSX export of the course file : questions and answers updated as by update,
+        # rows read and upserted by chunks, one transaction for the whole file
+        reports = list()
+        try:
+            for sheetfile in SheetFiles.readfile(path=path, filename=course.filename):
+                report = cls.importsheet(course=course, sheetfile=sheetfile)
+                reports.append(report)
+                if not report.success:
+                    break
+            if reports and all(report.success for report in reports):
+                db.session.commit()
+                for report in reports:
+                    report.message = (f"Succès : {report.rowscount} réponses importées en {report.seconds:.1f} s " +
+                                      f"(formation {course.label}, fichier {path}, onglet {report.sheetlabel})")
+            else:
+                db.session.rollback()
+                for report in reports:
+                    if report.success:
+                        report.success = False
+                        report.message = (f"Info : Import annulé (formation {course.label}, fichier {path}, " +
+                                          f"onglet {report.sheetlabel})")
+        except Exception as ex:
+            db.session.rollback()
+            for report in reports:
+                report.success = False
+                report.message = (f"Info : Import annulé (formation {course.label}, fichier {path}, " +
+                                  f"onglet {report.sheetlabel})")
+            reports.append(SheetReport(courselabel=course.label, message=(
+                f"Erreur : Echec de l'import du fichier {path} (formation {course.label}). Exception : {ex}")))
+        return reports
+
+    @classmethod
+    def importsheet(cls, course: Course, sheetfile: SheetFile) -> SheetReport:
+        # not committed, see importfile
+        report = SheetReport(courselabel=course.label, sheetlabel=sheetfile.sheetlabel)
+        start = time.perf_counter()
+        gform = cls.getimportform(course=course, sheetlabel=sheetfile.sheetlabel)
+        success = True
+        readcount = 0  # rows before the first one ignored
+        lastrecord = None
+        newquestions = list()  # type inferred over the whole column : revised by each chunk
+        for rows in SheetFiles.chunks(sheetfile.rows):
+            records = ApiAccess.torecords(sheetfile.header, rows)
+            sheetframe = SheetFrame.fromrecords(records)
+            revised = DbQuestion.revisefromsheet(questions=newquestions, sheetframe=sheetframe)
+            if revised:
+                DbFormStat.dropgrades(gform=gform, questions=revised)
+            newquestions += DbQuestion.createfromsheet(course=course, sheetframe=sheetframe)
+            skippedrows = list()
+            success = DbAnswer.updatefromsheet(gform=gform, sheetframe=sheetframe, skippedrows=skippedrows)
+            if not success:
+                break
+            if readcount == report.rowscount:
+                readcount += min(skippedrows, default=len(records))
+                if readcount > report.rowscount:
+                    lastrecord = records[readcount - report.rowscount - 1]
+            report.rowscount += len(records)
+        if success:
+            # high-water mark as after a full synchronization, up to the first row ignored
+            gform.lastrowindex = readcount
+            if lastrecord is not None:
+                gform.lastrowdt = DbAnswer.parsetimestamp(lastrecord.get(ApiAccess.TIMESTAMP_HEADER, ""),
+                                                          tzname=course.filetz)
+            gform.headerhash = ApiAccess.hashheader(sheetfile.header)
+            cls.setdates(gform=gform)
+        else:
+            report.message = (f"Erreur : Echec de l'import des réponses (formation {course.label}, " +
+                              f"fichier {sheetfile.path}, onglet {sheetfile.sheetlabel})")
+        report.success = success
+        report.seconds = time.perf_counter() - start
+        return report
+
 
 class DbQuestion:
 
     @classmethod
-    def createfromsheet(cls, course: Course, wsheetdata: List[dict]):
-        existingquestions = [question.text.strip() for question in course.questions]
-        for text in wsheetdata[0].keys():
-            if text.strip() in [ApiAccess.TIMESTAMP_HEADER, ApiAccess.EMAIL_HEADER]:
+    def createfromsheet(cls, course: Course, sheetframe: SheetFrame) -> List[Question]:
+        # returns the questions added
+        res = list()
+        existingquestions = {question.text.strip() for question in course.questions}
+        for text in sheetframe.headerindex.keys():
+            if text in ["", ApiAccess.TIMESTAMP_HEADER, ApiAccess.EMAIL_HEADER]:
                 pass
-            elif text.strip() not in existingquestions:
-                numint, numstr = 0, 0
-                for row in wsheetdata:
-                    if (type(row[text]) == int) or (row[text].isnumeric()):
-                        numint += 1
-                    else:
-                        numstr += 1
-                isint = Const.DBTRUE if numstr == 0 else Const.DBFALSE
+            elif text not in existingquestions:
+                isint = Const.DBTRUE if sheetframe.isint(text) else Const.DBFALSE
                 newquestion = Question(isint=isint, text=text, course_id=Course.id)
                 course.questions.append(newquestion)
+                res.append(newquestion)
+        return res
+
+    @classmethod
+    def revisefromsheet(cls, questions: List[Question], sheetframe: SheetFrame) -> List[Question]:
+        # integer questions answered by text in the rows read since their creation. Returns the questions revised
+        res = list()
+        for question in questions:
+            if question.isint == Const.DBTRUE and question.text in sheetframe.headerindex and \
+                    not sheetframe.isint(question.text):
+                question.isint = Const.DBFALSE
+                res.append(question)
+        return res
 
 
 class DbAnswer:
+    TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S"
+    # dialects supporting INSERT ... ON CONFLICT DO UPDATE
+    BULK_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+    BULK_SIZE = 1000  # answers per executemany
+    CHUNK_SIZE = 500  # students per query, below SQLite's limit on bound parameters
 
     @classmethod
-    def updatefromrow(cls, gform: Form, row: dict, tsheader: str, emailheader: str,
-                      studentsdict: dict, questionsdict: dict, answersdict: dict) -> bool:
-        timestamp = datetime.strptime(row[tsheader].strip(), "%d/%m/%Y %H:%M:%S")  # TODO securiser
-        email = row[emailheader].strip()
-        success = (email in studentsdict)
-        if not success:
-            flash(f"Erreur : Email {email} inconnu dans le fichier {gform.course.filename}, " +
-                  f"onglet {gform.sheetlabel}, réponse ignorée")
-        else:
-            studentid = studentsdict[email].id
-            for header, value in row.items():
-                if header not in (tsheader, emailheader):
-                    text = str(value).strip()
-                    questionid = questionsdict[header].id
-                    if (studentid, questionid) in answersdict:
-                        answer = answersdict[(studentid, questionid)]
-                        answer.timestamp = timestamp
-                        answer.text = text
-                    else:
-                        newanswer = Answer(timestamp=timestamp, text=text, form_id=gform.id,
-                                           student_id=studentid, question_id=questionid)
-                        gform.answers.append(newanswer)
-        return success
+    def parsetimestamp(cls, text: str, tzname: str) -> datetime:
+        return cls.parsetimestamps(values=[text], tzname=tzname)[0]
 
     @classmethod
-    def updatefromsheet(cls, gform: Form, wsheetdata: List[dict]) -> bool:
+    def parsetimestamps(cls, values: list, tzname: str) -> List[datetime]:
+        # times displayed in the file's timezone to naive UTC datetimes, None for malformed values.
+        # Each distinct value parsed once, the UTC offset computed once per hour (DST changes on the hour)
+        tz = cls.gettimezone(tzname)
+        parsed = dict()
+        offsets = dict()
+        res = list()
+        for value in values:
+            if value not in parsed:
+                localdt = cls.parselocal(str(value).strip())
+                if localdt is None:
+                    parsed[value] = None
+                else:
+                    hour = (localdt.toordinal(), localdt.hour)
+                    if hour not in offsets:
+                        offsets[hour] = localdt.replace(tzinfo=tz).utcoffset()
+                    parsed[value] = localdt - offsets[hour]
+            res.append(parsed[value])
+        return res
+
+    @classmethod
+    def parselocal(cls, text: str) -> datetime:
+        # "dd/mm/yyyy hh:mm:ss" read by position, strptime for the other layouts (no leading zeros...)
+        try:
+            if len(text) == 19 and text[2] == text[5] == "/" and text[13] == text[16] == ":":
+                res = datetime.fromisoformat(f"{text[6:10]}-{text[3:5]}-{text[0:2]}{text[10:]}")
+            else:
+                res = datetime.strptime(text, cls.TIMESTAMP_FORMAT)
+        except ValueError:
+            res = None
+        return res
+
+    @classmethod
+    def gettimezone(cls, tzname: str) -> timezone:
+        # timezone of the file (metadata of the spreadsheet), UTC if unknown
+        try:
+            res = zoneinfo.ZoneInfo(tzname)
+        except (ValueError, zoneinfo.ZoneInfoNotFoundError):
+            res = timezone.utc
+        return res
+
+    @classmethod
+    def updatefromsheet(cls, gform: Form, sheetframe: SheetFrame, skippedrows: List[int] = None) -> bool:
+        # bulk : answers values are upserted at once, otherwise answers objects are updated or added.
+        # skippedrows, if given, is filled with the indexes of the rows ignored (unknown student, malformed timestamp)
         success = False
-        if gform is not None and wsheetdata != []:
+        if gform is not None and sheetframe.rowscount > 0:
             tsheader = ApiAccess.TIMESTAMP_HEADER
             emailheader = ApiAccess.EMAIL_HEADER
-            success = ((tsheader in wsheetdata[0]) and (emailheader in wsheetdata[0]))
+            success = ((tsheader in sheetframe.headerindex) and (emailheader in sheetframe.headerindex))
             if not success:
-                flash(f"Erreur : Entêtes pour l'horodatage et/ou l'email non trouvés " +
-                      f"(formation {gform.course.label}, fichier {gform.course.filename}, " +
-                      f"onglet {gform.sheetlabel})")
+                Messages.flash(f"Erreur : Entêtes pour l'horodatage et/ou l'email non trouvés " +
+                               f"(formation {gform.course.label}, fichier {gform.course.filename}, " +
+                               f"onglet {gform.sheetlabel})")
             else:
                 course = gform.course
+                bulk = cls.bulkupsert()
                 studentsdict = {student.email.strip(): student for student in course.students}
                 questionsdict = {question.text.strip(): question for question in course.questions}
-                answersdict = {(answer.student_id, answer.question_id): answer for answer in gform.answers}
-                for index, row in enumerate(wsheetdata):
-                    success = cls.updatefromrow(gform=gform, row=row, tsheader=tsheader,
-                                                emailheader=emailheader, studentsdict=studentsdict,
-                                                questionsdict=questionsdict, answersdict=answersdict)
+                # each cell read once, column by column
+                timestamps = cls.parsetimestamps(values=sheetframe.column(tsheader), tzname=course.filetz)
+                emails = sheetframe.texts(emailheader)
+                if bulk:
+                    db.session.flush()  # new questions ids
+                    answersdict = dict()
+                    studentids = list({studentsdict[email].id for email in emails if email in studentsdict})
+                    oldtexts = cls.queryoldtexts(gform=gform, studentids=studentids)
+                else:
+                    answersdict = {(answer.student_id, answer.question_id): answer for answer in gform.answers}
+                    oldtexts = {key: answer.text for key, answer in answersdict.items()}
+                # texts added and replaced by question, for the form statistics
+                deltasdict = defaultdict(Counter)
+                malformed = [value for value, timestamp in zip(sheetframe.column(tsheader), timestamps)
+                             if timestamp is None]
+                if malformed:
+                    Messages.flash(f"Erreur : {len(malformed)} horodatage(s) non reconnu(s) dans le fichier " +
+                                   f"{course.filename}, onglet {gform.sheetlabel}, réponses ignorées (par exemple " +
+                                   f"'{malformed[0]}')")
+                questionstexts = [(questionsdict[text].id, sheetframe.texts(text))
+                                  for text in sheetframe.headerindex.keys()
+                                  if text not in ["", tsheader, emailheader]]
+                # rows of unknown students are ignored, the sheet is updated anyway
+                for index, email in enumerate(emails):
+                    if timestamps[index] is None:
+                        if skippedrows is not None:
+                            skippedrows.append(index)
+                        continue
+                    if email not in studentsdict:
+                        Messages.flash(f"Erreur : Email {email} inconnu dans le fichier {gform.course.filename}, " +
+                                       f"onglet {gform.sheetlabel}, réponse ignorée")
+                        if skippedrows is not None:
+                            skippedrows.append(index)
+                        continue
+                    studentid = studentsdict[email].id
+                    timestamp = timestamps[index]
+                    for questionid, texts in questionstexts:
+                        text = texts[index]
+                        oldtext = oldtexts.get((studentid, questionid))
+                        if text != oldtext:
+                            deltasdict[questionid][text] += 1
+                            if oldtext is not None:
+                                deltasdict[questionid][oldtext] -= 1
+                            oldtexts[(studentid, questionid)] = text
+                        if bulk:
+                            answersdict[(studentid, questionid)] = dict(
+                                timestamp=timestamp, text=text, form_id=gform.id,
+                                student_id=studentid, question_id=questionid)
+                        elif (studentid, questionid) in answersdict:
+                            answer = answersdict[(studentid, questionid)]
+                            answer.timestamp = timestamp
+                            answer.text = text
+                        else:
+                            newanswer = Answer(timestamp=timestamp, text=text, form_id=gform.id,
+                                               student_id=studentid, question_id=questionid)
+                            gform.answers.append(newanswer)
+                            answersdict[(studentid, questionid)] = newanswer  # same student twice in the sheet
+                if bulk:
+                    try:
+                        cls.upsert(list(answersdict.values()))
+                    except Exception as ex:
+                        db.session.rollback()
+                        success = False
+                        Messages.flash(f"Erreur : Echec de l'enregistrement des réponses (formation {course.label}, " +
+                                       f"fichier {course.filename}, onglet {gform.sheetlabel}). Exception : {ex}")
+                if success:
+                    DbFormStat.update(gform=gform, deltasdict=deltasdict,
+                                      gradeids={question.id for question in questionsdict.values()
+                                                if question.isint == Const.DBTRUE})
         return success
 
+    @classmethod
+    def queryoldtexts(cls, gform: Form, studentids: List[int]) -> Dict[Tuple[int, int], str]:
+        # texts of the answers of these students to the form by (student id, question id), before the update
+        res = dict()
+        for index in range(0, len(studentids), cls.CHUNK_SIZE):
+            answers = db.session.query(Answer.student_id, Answer.question_id, Answer.text).filter(
+                Answer.form_id == gform.id,
+                Answer.student_id.in_(studentids[index:index + cls.CHUNK_SIZE])
+            )
+            res.update({(answer.student_id, answer.question_id): answer.text for answer in answers})
+        return res
+
+    @classmethod
+    def bulkupsert(cls) -> bool:
+        # ON CONFLICT needs the unique key of the answers, missing from a database holding duplicate answers
+        # (see Db.upgrade) : the answers are then updated through the ORM
+        return app.config.get("ANSWERS_BULK_UPSERT", True) and db.engine.dialect.name in cls.BULK_INSERTS and \
+            cls.hasuniquekey()
+
+    @classmethod
+    def hasuniquekey(cls) -> bool:
+        key = {"form_id", "student_id", "question_id"}
+        inspector = db.inspect(db.engine)
+        uniquecolumns = [constraint["column_names"]
+                         for constraint in inspector.get_unique_constraints(Answer.__tablename__)]
+        uniquecolumns += [index["column_names"]
+                          for index in inspector.get_indexes(Answer.__tablename__) if index["unique"]]
+        return any(set(columns) == key for columns in uniquecolumns)
+
+    @classmethod
+    def upsert(cls, answersvalues: List[dict]):
+        # INSERT ... ON CONFLICT (form_id, student_id, question_id) DO UPDATE, executed by batches
+        # answersvalues must not hold the same key twice (PostgreSQL refuses to update a row twice)
+        insert = cls.BULK_INSERTS[db.engine.dialect.name](Answer.__table__)
+        statement = insert.on_conflict_do_update(
+            index_elements=[Answer.form_id, Answer.student_id, Answer.question_id],
+            set_=dict(timestamp=insert.excluded.timestamp, text=insert.excluded.text)
+        )
+        for index in range(0, len(answersvalues), cls.BULK_SIZE):
+            db.session.execute(statement, answersvalues[index:index + cls.BULK_SIZE])
+
+
+class DbFormStat:
+
+    @classmethod
+    def gradeof(cls, text: str) -> Optional[int]:
+        try:
+            res = int(text)
+        except (TypeError, ValueError):
+            res = None
+        return res
+
+    @classmethod
+    def apply(cls, stat: FormStat, textcounts: Dict[str, int], isint: bool):
+        # adds the answers counted by text, negative counts for the texts replaced
+        histogram = {int(grade): count for grade, count in stat.histogram.items()}
+        for text, count in textcounts.items():
+            stat.answerscount += count
+            grade = cls.gradeof(text) if isint else None
+            if grade is not None:
+                stat.gradescount += count
+                stat.gradessum += grade * count
+                histogram[grade] = histogram.get(grade, 0) + count
+        histogram = {grade: count for grade, count in sorted(histogram.items()) if count != 0}
+        stat.histogram = {str(grade): count for grade, count in histogram.items()}  # new dict, change detected
+        stat.grademax = max(histogram.keys(), default=None)
+
+    @classmethod
+    def update(cls, gform: Form, deltasdict: Dict[int, Counter], gradeids: set):
+        # deltas of the answers texts by question id, applied in the transaction of the answers (not committed)
+        statsdict = {stat.question_id: stat for stat in gform.stats}
+        for questionid, textcounts in deltasdict.items():
+            if questionid not in statsdict:
+                statsdict[questionid] = FormStat(question_id=questionid, answerscount=0, gradescount=0,
+                                                 gradessum=0, histogram={})
+                gform.stats.append(statsdict[questionid])
+            cls.apply(stat=statsdict[questionid], textcounts=textcounts, isint=(questionid in gradeids))
+
+    @classmethod
+    def dropgrades(cls, gform: Form, questions: List[Question]):
+        # questions no longer integer : their answers only counted
+        questionids = {question.id for question in questions}
+        for stat in gform.stats:
+            if stat.question_id in questionids:
+                stat.gradescount = 0
+                stat.gradessum = 0
+                stat.grademax = None
+                stat.histogram = {}
+
+    @classmethod
+    def rebuild(cls):
+        # statistics computed again from all the answers, not committed
+        db.session.query(FormStat).delete()
+        gradequestions = db.session.query(Question.id).filter(Question.isint == Const.DBTRUE)
+        gradeids = {question.id for question in gradequestions}
+        textcountsdict = defaultdict(Counter)
+        # grades counted by text, the other answers only counted
+        gradecounts = db.session.query(
+            Answer.form_id, Answer.question_id, Answer.text, func.count(Answer.id).label("textcount")
+        ).filter(
+            Answer.question_id.in_(gradequestions)
+        ).group_by(Answer.form_id, Answer.question_id, Answer.text)
+        for gradecount in gradecounts:
+            textcountsdict[(gradecount.form_id, gradecount.question_id)][gradecount.text] += gradecount.textcount
+        answerscounts = db.session.query(
+            Answer.form_id, Answer.question_id, func.count(Answer.id).label("answerscount")
+        ).filter(
+            Answer.question_id.not_in(gradequestions)
+        ).group_by(Answer.form_id, Answer.question_id)
+        for answerscount in answerscounts:
+            textcountsdict[(answerscount.form_id, answerscount.question_id)][""] += answerscount.answerscount
+        stats = list()
+        for (formid, questionid), textcounts in textcountsdict.items():
+            stat = FormStat(form_id=formid, question_id=questionid, answerscount=0, gradescount=0, gradessum=0,
+                            histogram={})
+            cls.apply(stat=stat, textcounts=textcounts, isint=(questionid in gradeids))
+            stats.append(stat)
+        db.session.add_all(stats)
+
+
+class DbSentiment:
+    CHUNK_SIZE = 500  # hashes per query, below SQLite's limit on bound parameters
+
+    @classmethod
+    def getsentiments(cls, texts: List[str]) -> Dict[str, Tuple[float, float]]:
+        # identical texts are looked up and analysed once
+        textsdict = {SentimentAnalyzer.hashtext(text): text for text in texts}
+        hashes = list(textsdict.keys())
+        sentimentsdict = dict()
+        try:
+            for index in range(0, len(hashes), cls.CHUNK_SIZE):
+                sentiments = db.session.query(
+                    Sentiment.texthash, Sentiment.polarity, Sentiment.subjectivity
+                ).filter(
+                    Sentiment.analyzer == SentimentAnalyzer.version(),
+                    Sentiment.texthash.in_(hashes[index:index + cls.CHUNK_SIZE])
+                )
+                for sentiment in sentiments:
+                    sentimentsdict[sentiment.texthash] = (sentiment.polarity, sentiment.subjectivity)
+        except Exception as ex:
+            Messages.flash(f"Erreur : {ex}")
+        # analyse and store missing texts
+        newhashes = [texthash for texthash in hashes if texthash not in sentimentsdict]
+        scores = SentimentAnalyzer.scorebatch([textsdict[texthash] for texthash in newhashes])
+        newsentiments = list()
+        for texthash, (polarity, subjectivity) in zip(newhashes, scores):
+            sentimentsdict[texthash] = (polarity, subjectivity)
+            newsentiments.append(Sentiment(texthash=texthash, analyzer=SentimentAnalyzer.version(),
+                                           polarity=polarity, subjectivity=subjectivity))
+        if newsentiments:
+            try:
+                db.session.add_all(newsentiments)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # stored meanwhile by a concurrent request, nothing lost
+            except Exception as ex:
+                db.session.rollback()
+                Messages.flash(f"Erreur : Echec de l'enregistrement des sentiments. Exception : {ex}")
+        return {text: sentimentsdict[texthash] for texthash, text in textsdict.items()}
+
 
 @dataclasses.dataclass()
 class Dashboard:
-    courses_list: List[Course]
-    students_list: List[Student]
-    forms_list: List[Form]
-    questions_list: List[Question]
+    course_ids: List[int]  # nothing selected : all the courses
+    student_ids: List[int]  # nothing selected : all the students
     startdate: datetime
     enddate: datetime
 
     @classmethod
     def querycriteria(cls):
         course_ids = Params.getsessionvar(Const.DASHBOARD_COURSE_IDS, default=[])
-        if not course_ids:
-            courses = db.session.query(Course).all()
-            course_ids = [c.id for c in courses]
-        else:
-            courses = db.session.query(Course).filter(Course.id.in_(course_ids)).all()
         student_ids = Params.getsessionvar(Const.DASHBOARD_STUDENT_IDS, default=[])
-        if not student_ids:
-            students = db.session.query(Student).all()
-            student_ids = [s.id for s in students]
-        else:
-            students = db.session.query(Student).filter(Student.id.in_(student_ids)).all()
-        jsonstartdate = Params.getsessionvar(Const.DASHBOARD_STARTDATE, default=[2000, 1, 1])
+        jsonstartdate = Params.getsessionvar(Const.DASHBOARD_STARTDATE, default=DTime.datetimeencode(DTime.min()))
         startdate = DTime.datetimedecode(jsonstartdate)
-        jsonenddate = Params.getsessionvar(Const.DASHBOARD_ENDDATE, default=[2100, 1, 1])
+        jsonenddate = Params.getsessionvar(Const.DASHBOARD_ENDDATE, default=DTime.datetimeencode(DTime.max()))
         enddate = DTime.datetimedecode(jsonenddate)
-        # prepare forms and questions too
-        forms = db.session.query(Form).filter(
-            Form.course_id.in_(course_ids),
-            Form.lastentrydt >= startdate,
-            Form.lastentrydt <= enddate
-        ).order_by(Form.id).all()
-        questions = db.session.query(Question).filter(
-            Question.course_id.in_(course_ids)
-        ).order_by(Question.id).all()
-        # create instance loaded with data
-        instance = cls(courses_list=courses, students_list=students, startdate=startdate, enddate=enddate,
-                       forms_list=forms, questions_list=questions)
+        instance = cls(course_ids=course_ids, student_ids=student_ids, startdate=startdate, enddate=enddate)
         return instance
 
+    def querycourses(self) -> List[Course]:
+        # the selected courses only, for display
+        return DbCourse.querybyids(self.course_ids)
+
+    def querystudents(self) -> List[Student]:
+        # the selected students only, for display
+        return DbStudent.querybyids(self.student_ids)
+
+    def queryquestions(self, isint: str) -> List[Question]:
+        questions = db.session.query(Question).filter(Question.isint == isint)
+        if self.course_ids:
+            questions = questions.filter(Question.course_id.in_(self.course_ids))
+        return questions.order_by(Question.id).all()
+
+    def queryformids(self) -> Query:
+        # ids of the forms in the criteria, used as a subquery
+        forms = db.session.query(Form.id).filter(Form.lastentrydt >= self.startdate, Form.lastentrydt <= self.enddate)
+        if self.course_ids:
+            forms = forms.filter(Form.course_id.in_(self.course_ids))
+        return forms
+
+    def filteranswers(self, query: Query, isint: str = None) -> Query:
+        # criteria as subqueries, no predicate for what is not selected
+        query = query.filter(Answer.form_id.in_(self.queryformids()))
+        if self.student_ids:
+            query = query.filter(Answer.student_id.in_(self.student_ids))
+        if isint is not None:
+            query = query.filter(Answer.question_id.in_(db.session.query(Question.id).filter(Question.isint == isint)))
+        return query
+
     def querynumanswers(self) -> List[NumAnswer]:
         res = list()
-        form_ids = [f.id for f in self.forms_list]
-        student_ids = [s.id for s in self.students_list]
-        questions = [q for q in self.questions_list if q.isint == Const.DBTRUE]
-        question_ids = [q.id for q in questions]
-        answers = db.session.query(Answer).filter(
-            Answer.form_id.in_(form_ids),
-            Answer.student_id.in_(student_ids),
-            Answer.question_id.in_(question_ids)
-        ).order_by(Answer.question_id)
+        questions = self.queryquestions(isint=Const.DBTRUE)
+        histogramsdict = {question.id: Counter() for question in questions}
+        if self.student_ids:
+            # grades of the selected students : one grouped query counts the answers by text
+            textcounts = self.filteranswers(db.session.query(
+                Answer.question_id,
+                Answer.text,
+                func.count(Answer.id).label("textcount")
+            ), isint=Const.DBTRUE).group_by(Answer.question_id, Answer.text)
+            for textcount in textcounts:
+                grade = DbFormStat.gradeof(textcount.text)
+                if grade is not None:
+                    histogramsdict[textcount.question_id][grade] += textcount.textcount
+        else:
+            # all the students : histograms of the forms statistics summed, the answers are not read
+            stats = db.session.query(FormStat.question_id, FormStat.histogram).filter(
+                FormStat.form_id.in_(self.queryformids()),
+                FormStat.gradescount > 0
+            )
+            for stat in stats:
+                if stat.question_id in histogramsdict:
+                    for grade, count in stat.histogram.items():
+                        histogramsdict[stat.question_id][int(grade)] += count
         #
         for question in questions:
-            grades = [int(answer.text) for answer in answers.filter(Answer.question_id == question.id)]
-            gradecount = len(grades)
-            grademax = 0
-            gradesum = 0
-            for grade in grades:
-                grademax = grade if grade > grademax else grademax
-                gradesum += grade
-            gradeaverage = gradesum / gradecount if gradecount > 0 else math.nan
-            res.append(NumAnswer(questiontext=question.text, grades=grades,
-                                 max=grademax, count=gradecount, average=gradeaverage))
+            res.append(NumAnswer.fromhistogram(questiontext=question.text, histogram=histogramsdict[question.id]))
         return res
 
+    def queryexportrows(self, chunksize: int) -> Query:
+        # answers with their course, form, student and question, fetched chunksize rows at a time
+        # (server side cursor where the database has one)
+        return self.filteranswers(db.session.query(
+            Course.label.label("course"),
+            Form.sheetlabel.label("form"),
+            Student.email.label("student"),
+            Question.text.label("question"),
+            Answer.timestamp.label("timestamp"),
+            Answer.text.label("text")
+        ).join(
+            Form, Answer.form_id == Form.id
+        ).join(
+            Course, Form.course_id == Course.id
+        ).join(
+            Student, Answer.student_id == Student.id
+        ).join(
+            Question, Answer.question_id == Question.id
+        )).order_by(Answer.id).yield_per(chunksize)
+
     def querytextanswers(self) -> List[TextAnswer]:
         res = list()
-        form_ids = [f.id for f in self.forms_list]
-        student_ids = [s.id for s in self.students_list]
-        questions = [q for q in self.questions_list if q.isint == Const.DBFALSE]
-        question_ids = [q.id for q in questions]
-        answers = db.session.query(Answer).filter(
-            Answer.form_id.in_(form_ids),
-            Answer.student_id.in_(student_ids),
-            Answer.question_id.in_(question_ids)
-        ).order_by(Answer.question_id)
-        #
-        # see example https://github.com/sloria/textblob-fr
-
+        questions = self.queryquestions(isint=Const.DBFALSE)
+        # texts of all the questions in one query, only the columns used
+        answers = self.filteranswers(db.session.query(Answer.question_id, Answer.text), isint=Const.DBFALSE)
+        textsdict = {question.id: list() for question in questions}
+        for answer in answers.order_by(Answer.question_id, Answer.id):
+            textsdict[answer.question_id].append(answer.text)
+        sentimentsdict = DbSentiment.getsentiments([text for texts in textsdict.values() for text in texts])
         for question in questions:
             polvalues = list()
             subvalues = list()
-            texts = [answer.text for answer in answers.filter(Answer.question_id == question.id)]
-            for text in texts:
-                blob = TextBlob(text, pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
-                qsentiment = blob.sentiment
+            for text in textsdict[question.id]:
+                qsentiment = sentimentsdict[text]
                 polvalues.append(qsentiment[0])
                 subvalues.append(qsentiment[1])
             res.append(TextAnswer(questiontext=question.text, polarities=polvalues,
@@ -25,6 +25,8 @@ class Course(db.Model):
 # Student
 class Student(db.Model):
     __tablename__ = "Students"
+    __table_args__ = (db.Index("ix_students_course_email", "course_id", "email"),
+                      db.Index("ix_students_course_id", "course_id", "id"))
 
     id = db.Column(db.Integer, primary_key=True)
     lastname = db.Column(db.String(80), nullable=False)
@@ -44,16 +46,22 @@ class Student(db.Model):
 # One form is in a many to one database.relationship with a Course
 class Form(db.Model):
     __tablename__ = "Forms"
+    __table_args__ = (db.Index("ix_forms_course", "course_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     sheetid = db.Column(db.Integer, nullable=False, unique=True)
     sheetlabel = db.Column(db.String(80), nullable=False)
     lastentrydt = db.Column(db.DateTime, nullable=False)
     lastreaddt = db.Column(db.DateTime, nullable=False)
+    # high-water mark : rows already read, timestamp of the last one and header they were read with
+    lastrowindex = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    lastrowdt = db.Column(db.DateTime)
+    headerhash = db.Column(db.String(64))
     course_id = db.Column(db.Integer, db.ForeignKey("Courses.id"), nullable=False)
 
     course = db.relationship("Course", back_populates="forms")
     answers = db.relationship("Answer", back_populates="form")
+    stats = db.relationship("FormStat", back_populates="form")
 
     def __repr__(self):
         return "<Sheet {} {}>".format(self.id, self.sheetlabel)
@@ -64,6 +72,7 @@ class Form(db.Model):
 # Question type is inferred by the app
 class Question(db.Model):
     __tablename__ = "Questions"
+    __table_args__ = (db.Index("ix_questions_course", "course_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     isint = db.Column(db.String(1), nullable=False)  # Y for integer, N for text
@@ -72,6 +81,7 @@ class Question(db.Model):
 
     course = db.relationship("Course", back_populates="questions")
     answers = db.relationship("Answer", back_populates="question")
+    stats = db.relationship("FormStat", back_populates="question")
 
     def __repr__(self):
         return "<Question {} {}>".format(self.id, self.text)
@@ -80,6 +90,12 @@ class Question(db.Model):
 # Answer : one answer per student per form (=> per week) per question
 class Answer(db.Model):
     __tablename__ = "Answers"
+    # the unique constraint also indexes the form_id lookups
+    __table_args__ = (db.UniqueConstraint("form_id", "student_id", "question_id",
+                                          name="uq_answers_form_student_question"),
+                      db.Index("ix_answers_question_form", "question_id", "form_id"),
+                      db.Index("ix_answers_student_form", "student_id", "form_id"),
+                      db.Index("ix_answers_timestamp", "timestamp"))
 
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, nullable=False)
@@ -94,3 +110,41 @@ class Answer(db.Model):
 
     def __repr__(self):
         return f"<Answer {self.id} {self.timestamp} {self.text}>"
+
+
+# Statistics of the answers to one question of one form, updated with the answers (see DbFormStat)
+# Grades are the answers to an integer question, histogram counts them by grade : {"4": 12, "5": 3}
+class FormStat(db.Model):
+    __tablename__ = "FormStats"
+    __table_args__ = (db.UniqueConstraint("form_id", "question_id", name="uq_formstats_form_question"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    answerscount = db.Column(db.Integer, nullable=False, default=0)
+    gradescount = db.Column(db.Integer, nullable=False, default=0)
+    gradessum = db.Column(db.Integer, nullable=False, default=0)
+    grademax = db.Column(db.Integer)
+    histogram = db.Column(db.JSON, nullable=False, default=dict)
+    form_id = db.Column(db.Integer, db.ForeignKey("Forms.id"), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey("Questions.id"), nullable=False)
+
+    form = db.relationship("Form", back_populates="stats")
+    question = db.relationship("Question", back_populates="stats")
+
+    def __repr__(self):
+        return f"<FormStat {self.form_id} {self.question_id} {self.answerscount}>"
+
+
+# Sentiment of an answer text, computed once per distinct text and analyzer version
+# The text itself is not stored, only its hash
+class Sentiment(db.Model):
+    __tablename__ = "Sentiments"
+    __table_args__ = (db.UniqueConstraint("texthash", "analyzer", name="uq_sentiments_texthash_analyzer"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    texthash = db.Column(db.String(64), nullable=False)
+    analyzer = db.Column(db.String(40), nullable=False)
+    polarity = db.Column(db.Float, nullable=False)
+    subjectivity = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<Sentiment {self.id} {self.polarity} {self.subjectivity}>"
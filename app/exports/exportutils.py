@@ -0,0 +1,97 @@
+import csv
+import io
+import itertools
+from datetime import timezone
+from typing import Iterable, Iterator, List
+
+from app import app
+from app.apputils import Const
+
+
+class ChunkSink:
+    # write-only file object keeping the bytes written since the last drain : lets a Parquet file be
+    # streamed as it is written (the writer only appends and asks for the position)
+    def __init__(self):
+        self.chunks = list()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        res = b"".join(self.chunks)
+        self.chunks.clear()
+        return res
+
+
+class AnswersExport:
+    # raw answers streamed in chunks : memory depends on CHUNK_SIZE, not on the number of answers.
+    # Timestamps stored in naive UTC, exported with their timezone
+    COLUMNS = ["course", "form", "student", "question", "timestamp", "text"]
+    FORMAT_CSV = "csv"
+    FORMAT_PARQUET = "parquet"
+    MIMETYPES = {FORMAT_CSV: "text/csv", FORMAT_PARQUET: "application/vnd.apache.parquet"}
+
+    @classmethod
+    def chunksize(cls) -> int:
+        return app.config.get("EXPORT_CHUNK_SIZE", Const.DEFAULT_EXPORT_CHUNK_SIZE)
+
+    @classmethod
+    def rowschunks(cls, rows: Iterable) -> Iterator[List]:
+        iterator = iter(rows)
+        chunk = list(itertools.islice(iterator, cls.chunksize()))
+        while chunk:
+            yield chunk
+            chunk = list(itertools.islice(iterator, cls.chunksize()))
+
+    @classmethod
+    def export(cls, rows: Iterable, exportformat: str) -> Iterator[bytes]:
+        if exportformat == cls.FORMAT_PARQUET:
+            return cls.parquetchunks(rows)
+        return cls.csvchunks(rows)
+
+    @classmethod
+    def csvchunks(cls, rows: Iterable) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(cls.COLUMNS)
+        for chunk in cls.rowschunks(rows):
+            writer.writerows((row.course, row.form, row.student, row.question,
+                              row.timestamp.replace(tzinfo=timezone.utc).isoformat(sep=" "), row.text) for row in chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    @classmethod
+    def parquetchunks(cls, rows: Iterable) -> Iterator[bytes]:
+        # one row group per chunk, sent as soon as written
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([("course", pa.string()), ("form", pa.string()), ("student", pa.string()),
+                            ("question", pa.string()), ("timestamp", pa.timestamp("s", tz="UTC")), ("text", pa.string())])
+        sink = ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for chunk in cls.rowschunks(rows):
+                columns = {column: [getattr(row, column) for row in chunk] for column in cls.COLUMNS}
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+        yield sink.drain()
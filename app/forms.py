@@ -89,10 +89,10 @@ class DashboardForm(FlaskForm):
         label="Formations"
     )
     startdate = DateField(
-        label="Date de début"
+        label="Date de début (UTC)"
     )
     enddate = DateField(
-        label="Date de fin"
+        label="Date de fin (UTC)"
     )
     students = SelectMultipleField(
         label="Etudiants"
@@ -0,0 +1,133 @@
+import dataclasses
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import List
+
+from app import app
+from app.apputils import Const, ProcessPools
+
+
+@dataclasses.dataclass
+class GraphSpec:
+    kind: str  # GraphCache.KIND_...
+    title: str
+    data: dict
+
+
+class GraphCache:
+    # Graphs files named by a hash of their kind, title and data : an unchanged graph is never drawn again
+    # and a file name always designates the same image (long-lived browser caching).
+    # The least recently used files are deleted above GRAPH_CACHE_MAX_BYTES
+    FOLDER = "graphs"  # in the static folder
+    PREFIX = "graph_"
+    KIND_GRADES = "grades"
+    KIND_SENTIMENTS = "sentiments"
+    POOL_NAME = "graphs"  # ProcessPools
+    TEMP_PREFIX = PREFIX + "tmp_"  # files being drawn
+    TEMP_GRACE_SECONDS = 600  # temporary files younger than this never evicted : still being drawn
+
+    @classmethod
+    def folder(cls) -> str:
+        res = os.path.join(app.static_folder, cls.FOLDER)
+        os.makedirs(res, exist_ok=True)
+        return res
+
+    @classmethod
+    def graphname(cls, kind: str, title: str, data: dict) -> str:
+        key = json.dumps({"kind": kind, "title": title, "data": data}, sort_keys=True)
+        return f"{cls.PREFIX}{kind}_{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.jpg"
+
+    @classmethod
+    def getgraphs(cls, specs: List[GraphSpec], workers: int = None) -> List[str]:
+        # names of the graphs files in the order of specs, the graphs not cached are drawn in parallel
+        if workers is None:
+            workers = app.config.get("GRAPH_WORKERS", Const.DEFAULT_GRAPH_WORKERS)
+        names = [cls.graphname(kind=spec.kind, title=spec.title, data=spec.data) for spec in specs]
+        todraw = dict()
+        for name, spec in zip(names, specs):
+            path = os.path.join(cls.folder(), name)
+            try:
+                os.utime(path)  # most recently used
+            except FileNotFoundError:
+                todraw[path] = spec  # same graph twice drawn once. Evicted meanwhile : drawn again
+        if workers <= 1 or len(todraw) <= 1:
+            cls.drawall(todraw)
+        else:
+            executor = None
+            try:
+                executor = ProcessPools.get(cls.POOL_NAME, workers=workers)
+                list(executor.map(cls.drawfile, todraw.values(), todraw.keys()))
+            except (OSError, BrokenProcessPool):
+                # no process pool available (sandbox, worker killed...) : serial drawing
+                if executor is not None:
+                    ProcessPools.discard(cls.POOL_NAME, executor)
+                cls.drawall({path: spec for path, spec in todraw.items() if not os.path.exists(path)})
+        return names
+
+    @classmethod
+    def drawall(cls, todraw: dict):
+        for path, spec in todraw.items():
+            cls.drawfile(spec, path)
+
+    @classmethod
+    def drawfile(cls, spec: GraphSpec, path: str):
+        # drawn under a temporary name then renamed : concurrent requests never see a partial file.
+        # Temporary files left by a crash have the prefix : deleted by evict as the least recently used, once old
+        handle, temppath = tempfile.mkstemp(prefix=cls.TEMP_PREFIX, suffix=".jpg", dir=os.path.dirname(path))
+        os.close(handle)
+        try:
+            cls.draw(kind=spec.kind, title=spec.title, data=spec.data, path=temppath)
+            os.chmod(temppath, 0o644)
+            os.replace(temppath, path)
+        finally:
+            if os.path.exists(temppath):
+                os.remove(temppath)
+
+    @classmethod
+    def draw(cls, kind: str, title: str, data: dict, path: str):
+        # pandas, matplotlib and plotnine take seconds to import : loaded by the first drawing only
+        import matplotlib
+        # https://stackoverflow.com/questions/27147300/matplotlib-tcl-asyncdelete-async-handler-deleted-by-the-wrong-thread
+        matplotlib.use("Agg")
+        import pandas as pd
+        import plotnine as p9
+        if kind == cls.KIND_GRADES:
+            graph = (p9.ggplot(pd.DataFrame({"x": data["grades"], "y": data["counts"]})) +
+                     p9.coord_cartesian(xlim=(0, data["max"] + 1)) +
+                     p9.geom_col(p9.aes(x="x", y="y")) +
+                     p9.labs(x="note", y="fréquence", title=title))
+        else:
+            graph = (p9.ggplot(pd.DataFrame({"x": data["polarities"], "y": data["subjectivities"]})) +
+                     p9.coord_cartesian(xlim=(-1, 1), ylim=(0, 1)) +
+                     p9.geom_point(p9.aes(x="x", y="y")) +
+                     p9.labs(x="polarité", y="subjectivité", title=title))
+        folder, filename = os.path.split(path)
+        graph.save(filename=filename, path=folder, width=5, height=5, format="jpg", verbose=False)
+
+    @classmethod
+    def evict(cls) -> List[str]:
+        # deletes the least recently used graphs above the maximum size
+        maxbytes = app.config.get("GRAPH_CACHE_MAX_BYTES", Const.DEFAULT_GRAPH_CACHE_MAX_BYTES)
+        mintempmtime = time.time() - cls.TEMP_GRACE_SECONDS
+        with os.scandir(cls.folder()) as entries:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries
+                     if entry.is_file() and entry.name.startswith(cls.PREFIX)]
+        files.sort()
+        totalbytes = sum(size for mtime, size, path in files)
+        res = list()
+        for mtime, size, path in files:
+            if totalbytes <= maxbytes:
+                break
+            if mtime > mintempmtime and os.path.basename(path).startswith(cls.TEMP_PREFIX):
+                continue  # drawn by a concurrent request
+            try:
+                os.remove(path)
+                res.append(path)
+            except OSError:
+                pass  # deleted by a concurrent request
+            totalbytes -= size
+        return res
@@ -0,0 +1,127 @@
+import csv
+import dataclasses
+import itertools
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+from app import app
+from app.apputils import Const
+
+
+@dataclasses.dataclass
+class SheetFile:
+    # one tab of a response file exported from Google Sheets, rows read on demand
+    path: str
+    sheetlabel: str
+    header: list
+    rows: Iterator[list]  # values as strings, as read through the API. Read before the next SheetFile
+
+
+@dataclasses.dataclass
+class SheetFrame:
+    # records of a sheet stored by column : built once, read by the questions inference and the answers update
+    header: List[str]  # trimmed
+    columns: List[list]  # values of each column, as in the records
+    headerindex: Dict[str, int]  # column of each header, the first one when repeated
+    rowscount: int
+
+    @classmethod
+    def fromrecords(cls, records: List[dict]) -> "SheetFrame":
+        keys = list(records[0].keys()) if records else []
+        header = [str(key).strip() for key in keys]
+        columns = [[record.get(key, "") for record in records] for key in keys]
+        headerindex = dict()
+        for index, text in enumerate(header):
+            headerindex.setdefault(text, index)
+        return cls(header=header, columns=columns, headerindex=headerindex, rowscount=len(records))
+
+    def column(self, header: str) -> list:
+        return self.columns[self.headerindex[header]]
+
+    def texts(self, header: str) -> List[str]:
+        # values as stored in the answers
+        return [str(value).strip() for value in self.column(header)]
+
+    def isint(self, header: str) -> bool:
+        # integers only : numbers of get_all_records or strings it would numericise to integers
+        return all(isinstance(value, int) or self.isinttext(str(value)) for value in self.column(header))
+
+    @classmethod
+    def isinttext(cls, text: str) -> bool:
+        # as gspread numericise : signed digits read by int(), without underscores
+        try:
+            int(text)
+        except ValueError:
+            return False
+        return "_" not in text
+
+
+class SheetFiles:
+    # local exports (File > Download) of a course responses file : a CSV file per tab or a XLSX file
+    EXTENSIONS = [".csv", ".xlsx"]
+    TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M:%S"  # as displayed by Google Sheets, see DbAnswer.TIMESTAMP_FORMAT
+
+    @classmethod
+    def chunksize(cls) -> int:
+        return app.config.get("IMPORT_CHUNK_SIZE", Const.DEFAULT_IMPORT_CHUNK_SIZE)
+
+    @classmethod
+    def chunks(cls, rows: Iterator[list]) -> Iterator[List[list]]:
+        # empty rows skipped (formatted but unused rows at the end of a sheet)
+        rows = (row for row in rows if any(str(cell).strip() for cell in row))
+        chunk = list(itertools.islice(rows, cls.chunksize()))
+        while chunk:
+            yield chunk
+            chunk = list(itertools.islice(rows, cls.chunksize()))
+
+    @classmethod
+    def readfile(cls, path: str, filename: str = "") -> Iterator[SheetFile]:
+        # filename : the course file name, removed from "<filename> - <tab>.csv"
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            yield from cls.readcsv(path=path, filename=filename)
+        elif extension == ".xlsx":
+            yield from cls.readxlsx(path=path)
+        else:
+            raise ValueError(f"Extension {extension} non prise en charge ({', '.join(cls.EXTENSIONS)})")
+
+    @classmethod
+    def readcsv(cls, path: str, filename: str = "") -> Iterator[SheetFile]:
+        sheetlabel = os.path.splitext(os.path.basename(path))[0]
+        if filename and sheetlabel.startswith(f"{filename} - "):
+            sheetlabel = sheetlabel[len(f"{filename} - "):]
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            rows = csv.reader(file)
+            header = next(rows, [])
+            yield SheetFile(path=path, sheetlabel=sheetlabel, header=header, rows=rows)
+
+    @classmethod
+    def readxlsx(cls, path: str) -> Iterator[SheetFile]:
+        # one form per worksheet, cells streamed by the read-only mode
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for worksheet in workbook.worksheets:
+                rows = (cls.cellstotext(row) for row in worksheet.iter_rows(values_only=True))
+                header = next(rows, [])
+                yield SheetFile(path=path, sheetlabel=worksheet.title, header=header, rows=rows)
+        finally:
+            workbook.close()
+
+    @classmethod
+    def cellstotext(cls, cells: tuple) -> list:
+        # typed cells back to the values displayed in the sheet, trailing empty cells removed
+        res = list()
+        for cell in cells:
+            if cell is None:
+                res.append("")
+            elif isinstance(cell, datetime):
+                res.append(cell.strftime(cls.TIMESTAMP_FORMAT))
+            elif isinstance(cell, float) and cell.is_integer():
+                res.append(str(int(cell)))
+            else:
+                res.append(str(cell))
+        while res and res[-1] == "":
+            res.pop()
+        return res
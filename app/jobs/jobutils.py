@@ -0,0 +1,106 @@
+import dataclasses
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from app import app
+from app.api.apiutils import ApiClient
+from app.apputils import Messages
+from app.database.dbutils import DbForm, SheetReport
+
+
+@dataclasses.dataclass
+class SyncJob:
+    id: str
+    dburi: str
+    status: str = "PENDING"  # PENDING, RUNNING, DONE
+    success: bool = False
+    startdt: datetime = None
+    enddt: datetime = None
+    reports: List[SheetReport] = dataclasses.field(default_factory=list)  # filled while sheets are read
+    messages: List[str] = dataclasses.field(default_factory=list)  # flashed while the sheets are read
+
+    def todict(self) -> dict:
+        reports = list(self.reports)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "success": self.success,
+            "startdt": self.startdt.isoformat() if self.startdt else None,
+            "enddt": self.enddt.isoformat() if self.enddt else None,
+            "sheetscount": len([report for report in reports if report.sheetlabel]),
+            "sheetsread": len([report for report in reports if report.success or report.message]),
+            "rowscount": sum(report.rowscount for report in reports),
+            "reports": [dataclasses.asdict(report) for report in reports],
+            "messages": list(self.messages)
+        }
+
+
+class SyncJobs:
+    # Google sync run by a background thread of this process, one at a time per database.
+    # The jobs are known by this process only : with several worker processes (gunicorn -w N), each one
+    # may start its own sync of the same database, the app is to be served by one process (threads allowed)
+    MAX_JOBS_KEPT = 20
+    lock = threading.Lock()
+    jobs: Dict[str, SyncJob] = dict()
+    running: Dict[str, str] = dict()  # database uri -> id of the job syncing it
+
+    @classmethod
+    def start(cls, minenddate: datetime, daysnochange: int) -> (bool, SyncJob):
+        # returns False and the running job if the database is already being synced
+        dburi = app.config["SQLALCHEMY_DATABASE_URI"]
+        with cls.lock:
+            if dburi in cls.running:
+                return False, cls.jobs[cls.running[dburi]]
+            job = SyncJob(id=uuid.uuid4().hex, dburi=dburi)
+            cls.jobs[job.id] = job
+            cls.running[dburi] = job.id
+            # forget the oldest finished jobs
+            finished = [oldjob for oldjob in cls.jobs.values() if oldjob.status == "DONE"]
+            for oldjob in finished[:max(0, len(cls.jobs) - cls.MAX_JOBS_KEPT)]:
+                del cls.jobs[oldjob.id]
+        thread = threading.Thread(target=cls.run, args=(job, minenddate, daysnochange),
+                                  name=f"sync-{job.id}", daemon=True)
+        thread.start()
+        return True, job
+
+    @classmethod
+    def get(cls, jobid: str) -> SyncJob:
+        with cls.lock:
+            return cls.jobs.get(jobid)
+
+    @classmethod
+    def run(cls, job: SyncJob, minenddate: datetime, daysnochange: int):
+        # no request here : the flashed messages go to the job
+        with app.app_context(), Messages.collect(job.messages):
+            job.status = "RUNNING"
+            job.startdt = datetime.now(tz=None)
+            try:
+                job.success, reports = DbForm.updateall(minenddate=minenddate, daysnochange=daysnochange,
+                                                        reports=job.reports)
+                job.messages.extend(cls.summary(job))
+            except Exception as ex:
+                job.success = False
+                job.messages.append(f"Erreur : Mise à jour interrompue. Exception : {ex}")
+            finally:
+                job.enddt = datetime.now(tz=None)
+                with cls.lock:
+                    job.status = "DONE"  # with the release, a new job may start as soon as this one is done
+                    del cls.running[job.dburi]
+
+    @classmethod
+    def summary(cls, job: SyncJob) -> List[str]:
+        res = list()
+        if not job.success or not all(report.success for report in job.reports):
+            res.append("Attention : Des erreurs dans la mise à jour, certaines réponses non mises à jour")
+        readreports = [report for report in job.reports if not report.skipped and report.sheetlabel]
+        if readreports:
+            slowest = max(readreports, key=lambda r: r.seconds)
+            res.append(f"Info : {len(readreports)} onglet(s) lu(s), {sum(r.rowscount for r in readreports)} " +
+                       f"ligne(s), onglet le plus long {slowest.sheetlabel} ({slowest.courselabel}) " +
+                       f"en {slowest.seconds:.1f} s")
+        apistats = ApiClient.getstats()
+        res.append(f"Info : API Google, {apistats.requests} requête(s) sur {apistats.connections} connexion(s), " +
+                   f"{apistats.tokenrefreshes} obtention(s) de jeton depuis le démarrage")
+        return res
@@ -0,0 +1,70 @@
+import hashlib
+import importlib.metadata
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+
+from app import app
+from app.apputils import Const, ProcessPools
+
+
+class SentimentAnalyzer:
+    CHUNK_SIZE = 200  # texts sent at once to a worker process
+    POOL_NAME = "sentiments"  # ProcessPools, workers started with the tools loaded
+    # textblob and its french models take seconds to load : imported by the first scoring only
+    # built once per process (and per worker process), see inittools
+    tagger = None
+    analyzer = None
+    textblob = None
+
+    @classmethod
+    def version(cls) -> str:
+        # stored with each cached sentiment : a new analyzer version invalidates the cache.
+        # Read from the package metadata, so that cached sentiments do not load textblob
+        return f"textblob-fr {importlib.metadata.version('textblob-fr')}"
+
+    @classmethod
+    def hashtext(cls, text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def inittools(cls):
+        if cls.textblob is None:
+            from textblob import TextBlob
+            cls.textblob = TextBlob
+        if cls.tagger is None or cls.analyzer is None:
+            from textblob_fr import PatternTagger, PatternAnalyzer
+            cls.tagger = PatternTagger()
+            cls.analyzer = PatternAnalyzer()
+
+    @classmethod
+    def score(cls, text: str) -> Tuple[float, float]:
+        # see example https://github.com/sloria/textblob-fr
+        cls.inittools()
+        blob = cls.textblob(text, pos_tagger=cls.tagger, analyzer=cls.analyzer)
+        sentiment = blob.sentiment
+        return sentiment[0], sentiment[1]
+
+    @classmethod
+    def scorechunk(cls, texts: List[str]) -> List[Tuple[float, float]]:
+        return [cls.score(text) for text in texts]
+
+    @classmethod
+    def scorebatch(cls, texts: List[str], workers: int = None) -> List[Tuple[float, float]]:
+        # results in the same order as texts
+        if workers is None:
+            workers = app.config.get("SENTIMENT_WORKERS", Const.DEFAULT_SENTIMENT_WORKERS)
+        chunks = [texts[index:index + cls.CHUNK_SIZE] for index in range(0, len(texts), cls.CHUNK_SIZE)]
+        if workers <= 1 or len(chunks) <= 1:
+            return cls.scorechunk(texts)
+        res = []
+        executor = None
+        try:
+            executor = ProcessPools.get(cls.POOL_NAME, workers=workers, initializer=cls.inittools)
+            for scores in executor.map(cls.scorechunk, chunks):
+                res.extend(scores)
+        except (OSError, BrokenProcessPool):
+            # no process pool available (sandbox, worker killed...) : serial scoring
+            if executor is not None:
+                ProcessPools.discard(cls.POOL_NAME, executor)
+            res = cls.scorechunk(texts)
+        return res
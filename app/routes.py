@@ -1,19 +1,17 @@
 from datetime import datetime, timedelta
 
-import matplotlib
-import pandas as pd
-from flask import flash, render_template, url_for, redirect, session
-from plotnine import *
+from flask import flash, render_template, url_for, redirect, session, request, jsonify, send_from_directory, \
+    Response, stream_with_context
 
 from app import app, db
-from app.apputils import Const, Params, DTime, FileUtils
+from app.apputils import Const, Params, DTime, NumAnswer
 from app.database.dbutils import DbCourse, DbStudent, DbForm, Db, Dashboard
 from app.database.models import Course, Student
 from app.forms import CourseCreateForm, CourseDeleteForm, StudentCreateForm, StudentDeleteForm, SpreadsheetSelect, \
     SheetsSelect, InitForm, DashboardForm
-
-# https://stackoverflow.com/questions/27147300/matplotlib-tcl-asyncdelete-async-handler-deleted-by-the-wrong-thread
-matplotlib.use("Agg")
+from app.exports.exportutils import AnswersExport
+from app.graphs.graphutils import GraphCache, GraphSpec
+from app.jobs.jobutils import SyncJobs
 
 
 @app.route("/")
@@ -45,8 +43,15 @@ def basesetup():
 
 @app.route("/courses", methods=["GET"])
 def courses():
-    courses_list = db.session.query(Course).order_by(Course.startdate).all()
-    return render_template("courses.html", courses=courses_list)
+    courses_list, after = DbCourse.querypage(after=request.args.get("after"), size=Db.pagesize())
+    return render_template("courses.html", courses=courses_list, after=after)
+
+
+@app.route("/course/search", methods=["GET"])
+def course_search():
+    # choices of the courses pickers
+    courses_list = DbCourse.search(text=request.args.get("q", ""), limit=Db.searchlimit())
+    return jsonify([{"id": str(course.id), "text": coursetext(course)} for course in courses_list])
 
 
 @app.route("/course/create", methods=["GET", "POST"])
@@ -67,13 +72,9 @@ def course_create():
 
 @app.route("/course/delete", methods=["GET", "POST"])
 def course_delete():
-    courses_list = db.session.query(Course).order_by(Course.startdate).all()
     form = CourseDeleteForm()
-    form.course.choices = []
-    for course in courses_list:
-        displaytext = f"{course.label} du {DTime.formatdate(course.startdate)} au " \
-                      f"{DTime.formatdate(course.enddate)}, fichier {course.filename}"
-        form.course.choices.append((str(course.id), displaytext))
+    # the choices are searched by the browser, only the submitted one is needed to validate
+    form.course.choices = [(str(course.id), coursetext(course)) for course in DbCourse.querybyids([form.course.data])]
     if form.validate_on_submit():
         success, message = DbCourse.delete(courseid=form.course.data)
         flash(message)
@@ -84,21 +85,21 @@ def course_delete():
 
 @app.route("/students", methods=["GET"])
 def students():
-    students_list = db.session.query(Student).order_by(
-        Student.course_id, Student.id
-    ).all()
-    return render_template("students.html", students=students_list)
+    students_list, after = DbStudent.querypage(after=request.args.get("after"), size=Db.pagesize())
+    return render_template("students.html", students=students_list, after=after)
+
+
+@app.route("/student/search", methods=["GET"])
+def student_search():
+    # choices of the students pickers
+    students_list = DbStudent.search(text=request.args.get("q", ""), limit=Db.searchlimit())
+    return jsonify([{"id": str(student.id), "text": studenttext(student)} for student in students_list])
 
 
 @app.route("/student/create", methods=["GET", "POST"])
 def student_create():
-    courses_list = db.session.query(Course).all()
     form = StudentCreateForm()
-    form.course.choices = []
-    for course in courses_list:
-        displaytext = f"{course.label} du {DTime.formatdate(course.startdate)} au " \
-                      f"{DTime.formatdate(course.enddate)}, fichier {course.filename}"
-        form.course.choices.append((str(course.id), displaytext))
+    form.course.choices = [(str(course.id), coursetext(course)) for course in DbCourse.querybyids([form.course.data])]
     if form.validate_on_submit():
         success, message = DbStudent.insert(
             lastname=form.lastname.data,
@@ -114,15 +115,9 @@ def student_create():
 
 @app.route("/student/delete", methods=["GET", "POST"])
 def student_delete():
-    students_list = db.session.query(Student).order_by(
-        Student.course_id, Student.lastname, Student.firstname
-    )
     form = StudentDeleteForm()
-    form.student.choices = []
-    for student in students_list:
-        displaytext = f"Etudiant(e) {student.firstname} {student.lastname} (email {student.email}, " \
-                      f"formation {student.course.label})"
-        form.student.choices.append((str(student.id), displaytext))
+    form.student.choices = [(str(student.id), studenttext(student))
+                            for student in DbStudent.querybyids([form.student.data])]
     if form.validate_on_submit():
         success, message = DbStudent.delete(studentid=form.student.data)
         flash(message)
@@ -166,32 +161,38 @@ def sheets():
         else:
             session[Const.MAX_DAYS_SHEET_UNCHANGED] = form.daysnochange.data
             daysnochange = int(form.daysnochange.data)
-        success = DbForm.updateall(minenddate=minenddate, daysnochange=daysnochange)
-        if not success:
-            flash("Attention : Des erreurs dans la mise à jour, certaines réponses non mises à jour")
-        return redirect(url_for("sheets"))
+        started, job = SyncJobs.start(minenddate=minenddate, daysnochange=daysnochange)
+        if started:
+            flash("Info : Mise à jour lancée")
+        else:
+            flash("Attention : Une mise à jour est déjà en cours")
+        return redirect(url_for("sheets", job=job.id))
     else:
         daysnochange = Params.getsessionvar(name=Const.MAX_DAYS_SHEET_UNCHANGED,
                                             default=Const.DEFAULT_DAYS_UNCHANGED)
         form.daysnochange.data = daysnochange
         oksheets = DbForm.queryforms(minenddate=minenddate, daysnochange=form.daysnochange.data)
-    return render_template("sheets.html", gforms=oksheets, form=form)
+    job = SyncJobs.get(request.args.get("job", ""))
+    return render_template("sheets.html", gforms=oksheets, form=form, job=job)
+
+
+@app.route("/sheets/job/<jobid>", methods=["GET"])
+def sheets_job(jobid: str):
+    job = SyncJobs.get(jobid)
+    if job is None:
+        return jsonify({"id": jobid, "status": "UNKNOWN"}), 404
+    return jsonify(job.todict())
 
 
 @app.route("/dashboard", methods=["GET", "POST"])
 def dashboard():
     # TODO check dates coherent
     form = DashboardForm()
-    form.courses.choices = []
-    form.students.choices = []
-    for course in db.session.query(Course).all():
-        displaytext = f"{course.label} du {DTime.formatdate(course.startdate)} au " \
-                      f"{DTime.formatdate(course.enddate)}, fichier {course.filename}"
-        form.courses.choices.append((str(course.id), displaytext))
-    for student in db.session.query(Student).all():
-        displaytext = f"{student.firstname} {student.lastname} (email {student.email}, " \
-                      f"formation {student.course.label})"
-        form.students.choices.append((str(student.id), displaytext))
+    # the choices are searched by the browser, only the submitted ones are needed to validate
+    form.courses.choices = [(str(course.id), coursetext(course))
+                            for course in DbCourse.querybyids(form.courses.data or [])]
+    form.students.choices = [(str(student.id), studenttext(student))
+                             for student in DbStudent.querybyids(form.students.data or [])]
     if form.validate_on_submit():
         session["DASHBOARD_COURSE_IDS"] = [int(x) for x in form.courses.data]
         session["DASHBOARD_STUDENT_IDS"] = [int(x) for x in form.students.data]
@@ -213,49 +214,117 @@ def dashboard_analyze():
     form.students.render_kw = {"readonly": True}
     form.startdate.render_kw = {"readonly": True}
     form.enddate.render_kw = {"readonly": True}
-    form.courses.choices = []
-    form.students.choices = []
-    for course in dashbrd.courses_list:
-        displaytext = f"{course.label} du {DTime.formatdate(course.startdate)} au " \
-                      f"{DTime.formatdate(course.enddate)}, fichier {course.filename}"
-        form.courses.choices.append((str(course.id), displaytext))
-    for student in dashbrd.students_list:
-        displaytext = f"{student.firstname} {student.lastname} (email {student.email}, " \
-                      f"formation {student.course.label})"
-        form.students.choices.append((str(student.id), displaytext))
+    form.courses.choices = [(str(course.id), coursetext(course)) for course in dashbrd.querycourses()]
+    form.students.choices = [(str(student.id), studenttext(student)) for student in dashbrd.querystudents()]
+    # nothing selected : no filter
+    if not form.courses.choices:
+        form.courses.choices.append(("", "Toutes les formations"))
+    if not form.students.choices:
+        form.students.choices.append(("", "Tous les étudiants"))
     form.startdate.data = dashbrd.startdate.date()
     form.enddate.data = dashbrd.enddate.date()
+    # graphs drawn by the browser from dashboard_data
+    render = request.args.get("render", app.config.get("DASHBOARD_RENDER", Const.RENDER_SERVER))
+    if render == Const.RENDER_CLIENT:
+        return render_template("dashboard_analyze.html", form=form, render=render,
+                               numstats=[], numgraphpaths=[], textgraphpaths=[])
     # prepare num graphs
-    numgraphpaths = list()
-    numanswers = dashbrd.querynumanswers()
-    curtime = datetime.now(tz=None)
-    suffix = f"{curtime.hour}{curtime.minute}{curtime.second}"
-    for qindex, numanswer in enumerate(numanswers):
-        data = pd.DataFrame({"x": numanswer.grades})
+    numspecs = list()
+    numstats = list()
+    for numanswer in dashbrd.querynumanswers():
         title = Dashboard.wraptext(text=numanswer.questiontext, maxlen=50)
-        gradegraph = (ggplot(data) +
-                      coord_cartesian(xlim=(0, numanswer.max + 1)) +
-                      geom_bar(aes(x="x")) +
-                      labs(x="note", y="fréquence", title=title))
-        graphname = f"graph_n{qindex}_{suffix}.jpg"
-        gradegraph.save(filename=graphname, path=app.static_folder, width=5, height=5)
-        numgraphpaths.append(graphname)
+        numspecs.append(GraphSpec(kind=GraphCache.KIND_GRADES, title=title, data=gradesdata(numanswer)))
+        numstats.append(gradesstats(numanswer))
     # preapre text graphs
-    textgraphpaths = list()
-    textanswers = dashbrd.querytextanswers()
-    for qindex, textanswers in enumerate(textanswers):
-        data = pd.DataFrame({"x": textanswers.polarities, "y": textanswers.subjectivities})
-        title = Dashboard.wraptext(text=textanswers.questiontext, maxlen=50)
-        textgraph = (ggplot(data) +
-                     coord_cartesian(xlim=(-1, 1), ylim=(0, 1)) +
-                     geom_point(aes(x="x", y="y")) +
-                     labs(x="polarité", y="subjectivité", title=title))
-        graphname = f"graph_t{qindex}_{suffix}.jpg"
-        textgraph.save(filename=graphname, path=app.static_folder, width=5, height=5)
-        textgraphpaths.append(graphname)
-    # delete old graphs
-    FileUtils.deletefiles(prefix="graph_", suffix=f"_{suffix}.jpg")
+    textspecs = list()
+    for textanswer in dashbrd.querytextanswers():
+        title = Dashboard.wraptext(text=textanswer.questiontext, maxlen=50)
+        data = {"polarities": textanswer.polarities, "subjectivities": textanswer.subjectivities}
+        textspecs.append(GraphSpec(kind=GraphCache.KIND_SENTIMENTS, title=title, data=data))
+    # draw all the graphs not cached at once
+    graphpaths = GraphCache.getgraphs(numspecs + textspecs)
+    numgraphpaths = graphpaths[:len(numspecs)]
+    textgraphpaths = graphpaths[len(numspecs):]
+    # delete least recently used graphs
+    GraphCache.evict()
     return render_template("dashboard_analyze.html",
                            form=form,
+                           render=render,
+                           numstats=numstats,
                            numgraphpaths=numgraphpaths,
                            textgraphpaths=textgraphpaths)
+
+
+@app.route("/dashboard/data")
+def dashboard_data():
+    # graphs data for the browser : grades histograms and (polarity, subjectivity) pairs
+    dashbrd = Dashboard.querycriteria()
+    numgraphs = list()
+    for numanswer in dashbrd.querynumanswers():
+        numgraphs.append({
+            "title": Dashboard.wraptext(text=numanswer.questiontext, maxlen=50).split("\n"),
+            **gradesdata(numanswer),
+            "stats": gradesstats(numanswer)
+        })
+    textgraphs = list()
+    for textanswer in dashbrd.querytextanswers():
+        textgraphs.append({
+            "title": Dashboard.wraptext(text=textanswer.questiontext, maxlen=50).split("\n"),
+            "points": [[round(polarity, 3), round(subjectivity, 3)] for polarity, subjectivity
+                       in zip(textanswer.polarities, textanswer.subjectivities)]
+        })
+    return jsonify({"numgraphs": numgraphs, "textgraphs": textgraphs})
+
+
+@app.route("/dashboard/export")
+def dashboard_export():
+    # raw answers selected by the dashboard criteria, streamed as CSV or Parquet
+    exportformat = request.args.get("format", AnswersExport.FORMAT_CSV)
+    if exportformat not in AnswersExport.MIMETYPES:
+        flash(f"Erreur : Format d'export inconnu : {exportformat}")
+        return redirect(url_for("dashboard_analyze"))
+    dashbrd = Dashboard.querycriteria()
+    rows = dashbrd.queryexportrows(chunksize=AnswersExport.chunksize())
+    filename = f"reponses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{exportformat}"
+    return Response(stream_with_context(AnswersExport.export(rows=rows, exportformat=exportformat)),
+                    mimetype=AnswersExport.MIMETYPES[exportformat],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+def coursetext(course: Course) -> str:
+    return f"{course.label} du {DTime.formatdate(course.startdate)} au " \
+           f"{DTime.formatdate(course.enddate)}, fichier {course.filename}"
+
+
+def studenttext(student: Student) -> str:
+    # student.course to be loaded with the student (joinedload)
+    return f"{student.firstname} {student.lastname} (email {student.email}, formation {student.course.label})"
+
+
+def gradesdata(numanswer: NumAnswer) -> dict:
+    # fixed bins from 0 to the highest grade, the answered grades only out of a grading scale (years...)
+    if numanswer.min < 0 or numanswer.max > Const.MAX_GRADE_BINS:
+        return {"grades": numanswer.grades.tolist(), "counts": numanswer.counts.tolist(), "max": numanswer.max}
+    counts = numanswer.histogram(first=0)
+    return {"grades": list(range(len(counts))), "counts": counts.tolist(), "max": numanswer.max}
+
+
+def gradesstats(numanswer: NumAnswer) -> dict:
+    res = {"question": numanswer.questiontext, "count": numanswer.count,
+           "average": None, "std": None, "median": None, "first": None, "last": None}
+    # no statistic without answers (NaN is not valid JSON)
+    if numanswer.count > 0:
+        first, median, last = numanswer.percentiles([25, 50, 75])
+        res.update(average=round(numanswer.average, 2), std=round(numanswer.std, 2),
+                   median=median, first=first, last=last)
+    return res
+
+
+@app.route("/graphs/<name>")
+def graph(name: str):
+    # graph names change with their content : cached by browsers for a year
+    response = send_from_directory(GraphCache.folder(), name)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 24 * 3600
+    return response
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+from private.privateconfig import Config
+
+# the tests database replaces the configured one before the application is imported : Flask-SQLAlchemy
+# creates its engine with the application (as benchmarks/benchutils.py usedatabase)
+TEST_DB = "test.db"
+PRIVATEDIR = os.environ.get("PRIVATEDIR", tempfile.gettempdir())
+TEST_DB_URI = "sqlite:///" + os.path.join(PRIVATEDIR, TEST_DB)
+
+Config.SQLALCHEMY_DATABASE_URI = TEST_DB_URI
+Config.TESTING = True
@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+import requests
+from google.auth import credentials
+from google.auth.transport.requests import Request
+from requests.adapters import BaseAdapter
+
+from app.api.apiutils import ApiClient, ApiStats
+
+API_URL = "https://sheets.example/"  # handled by RecordingAdapter, the pooled adapter kept for the others
+
+
+class FakeCredentials(credentials.Credentials):
+    # a new token per refresh, valid for an hour
+
+    def __init__(self):
+        super().__init__()
+        self.refreshes = 0
+
+    def refresh(self, request):
+        time.sleep(0.05)  # concurrent requests sent meanwhile
+        request(url="https://oauth2.example/token", method="POST")
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+class RecordingAdapter(BaseAdapter):
+    # answers every request, records the tokens sent
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.tokens = list()
+
+    def send(self, request, **kwargs):
+        with self.lock:
+            self.tokens.append(request.headers.get("Authorization"))
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class ApiClientTests(unittest.TestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        self.stats = ApiClient.stats
+        ApiClient.stats = ApiStats()
+        ApiClient.setclient(None)
+
+    # executed after each test
+    def tearDown(self):
+        ApiClient.setclient(None)
+        ApiClient.stats = self.stats
+
+    def getclients(self, count: int) -> list:
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            return list(executor.map(lambda num: ApiClient.getclient(), range(count)))
+
+    def test_one_client_per_process(self):
+        def createclient():
+            time.sleep(0.05)  # concurrent threads waiting meanwhile
+            return object()
+
+        with mock.patch.object(ApiClient, "createclient", side_effect=createclient) as create:
+            clients = self.getclients(8)
+        self.assertEqual(create.call_count, 1)
+        self.assertTrue(all(client is clients[0] for client in clients))
+        self.assertEqual((ApiClient.stats.clientcreations, ApiClient.stats.clientreuses), (1, 7))
+
+    def test_token_refreshed_once(self):
+        creds = FakeCredentials()
+        with mock.patch("app.api.apiutils.ServiceAccountCredentials"), \
+                mock.patch("app.api.apiutils.convert_credentials", return_value=creds), \
+                mock.patch.object(Request, "__call__"):
+            session = ApiClient.getclient().session
+            adapter = RecordingAdapter()
+            session.mount(API_URL, adapter)
+
+            def send(count: int):
+                with ThreadPoolExecutor(max_workers=count) as executor:
+                    responses = list(executor.map(lambda num: session.get(f"{API_URL}{num}"), range(count)))
+                self.assertTrue(all(response.status_code == 200 for response in responses))
+
+            # first requests of the sync threads : one token fetched for all of them
+            send(8)
+            self.assertEqual(adapter.tokens, ["Bearer token-1"] * 8)
+            # token expired : fetched again once
+            creds.expiry = datetime.utcnow() - timedelta(minutes=1)
+            adapter.tokens.clear()
+            send(8)
+            self.assertEqual(adapter.tokens, ["Bearer token-2"] * 8)
+        self.assertEqual(creds.refreshes, 2)
+        self.assertEqual(ApiClient.stats.tokenrefreshes, 2)
+        self.assertIs(ApiClient.getclient().session, session)
+
+
+if __name__ == "__main__":
+    unittest.main()
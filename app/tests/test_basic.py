@@ -1,31 +1,37 @@
-import os
 import unittest
 from datetime import datetime
 
 from app import app, db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
 from app.database.models import Course, Student
+from testutils import DbTestCase
 
-TEST_DB = "test.db"
-PRIVATEDIR = "D:/Git/ProjetNLP_jury/private"
+FILEIDS = ["1f9UU0D9B55Yv4s8qNGx_rLBE9C6vXxSdnjE3Wjvrm7A", "1JIPYREs3XuzdOYIPD8SbUrnz0hz4MIpDL8EbHsPwd2k",
+           "1TuyCIispLGANs1rxzXqrsPdzK_Rn9Qis5XHD2zxLms0"]
 
 
-class BasicTests(unittest.TestCase):
+class BasicTests(DbTestCase):
 
     # executed prior to each test
     def setUp(self):
-        app.config["TESTING"] = True
         app.config["WTF_CSRF_ENABLED"] = False
         app.config["DEBUG"] = False
-        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(PRIVATEDIR, TEST_DB)
+        super().setUp()
         self.app = app.test_client()
-        db.drop_all()
-        db.create_all()
+        # the courses files served by the local stand-in of the Google API
+        client = FakeClient()
+        for fileid in FILEIDS:
+            client.addspreadsheet(key=fileid, title=f"Fichier {fileid}")
+        ApiClient.setclient(client)
 
         self.assertEqual(app.debug, False)
 
     # executed after each test
     def tearDown(self):
-        pass
+        ApiClient.setclient(None)
+        super().tearDown()
+        app.config.pop("WTF_CSRF_ENABLED")
 
     def test_index_page(self):
         response = self.app.get("/", follow_redirects=True)
@@ -0,0 +1,164 @@
+import csv
+import io
+import unittest
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+
+from flask import session
+
+from app import app, db
+from app.apputils import Const, DTime
+from app.database.dbutils import Dashboard, DbFormStat
+from app.database.models import Answer, Course, Form, Question, Student
+from app.exports.exportutils import AnswersExport
+from testutils import DbTestCase
+
+
+class DashboardTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        # 2 courses of 2 weekly forms answered by 3 students : one grade and one text
+        sheetid = 0
+        for coursenum in range(2):
+            course = Course(label=f"Formation {coursenum}", startdate=datetime(2020, 1, 6),
+                            enddate=datetime(2020, 6, 1), fileid=f"file-{coursenum}", filename=f"file-{coursenum}",
+                            filetz="Europe/Paris")
+            course.students = [Student(lastname=f"Nom {num}", firstname="Prénom",
+                                       email=f"etudiant{num}.formation{coursenum}@gmail.com") for num in range(3)]
+            grade = Question(isint=Const.DBTRUE, text="Note ?")
+            comment = Question(isint=Const.DBFALSE, text="Commentaire ?")
+            course.questions = [grade, comment]
+            for week in range(2):
+                sheetid += 1
+                timestamp = datetime(2020, 1, 10 + 7 * week)
+                form = Form(sheetid=sheetid, sheetlabel=f"Semaine {week + 1}", lastentrydt=timestamp,
+                            lastreaddt=timestamp, course=course)
+                for num, student in enumerate(course.students):
+                    form.answers.append(Answer(timestamp=timestamp, text=str(num + 1), student=student,
+                                               question=grade))
+                    form.answers.append(Answer(timestamp=timestamp, text="Très bien", student=student,
+                                               question=comment))
+            db.session.add(course)
+        db.session.flush()
+        DbFormStat.rebuild()  # answers added without the synchronization
+        db.session.commit()
+        session[Const.DASHBOARD_STARTDATE] = DTime.datetimeencode(DTime.min())
+        session[Const.DASHBOARD_ENDDATE] = DTime.datetimeencode(DTime.max())
+
+    def test_nothing_selected(self):
+        session.clear()
+        dashbrd = Dashboard.querycriteria()
+        self.assertEqual(dashbrd.querycourses(), [])
+        self.assertEqual(dashbrd.querystudents(), [])
+        self.assertEqual([numanswer.count for numanswer in dashbrd.querynumanswers()], [6, 6])
+        self.assertEqual([len(textanswer.polarities) for textanswer in dashbrd.querytextanswers()], [6, 6])
+        self.assertEqual(len(dashbrd.queryexportrows(chunksize=5).all()), 24)
+
+    def test_selection(self):
+        course = db.session.query(Course).filter(Course.label == "Formation 1").one()
+        session[Const.DASHBOARD_COURSE_IDS] = [course.id]
+        session[Const.DASHBOARD_STUDENT_IDS] = [course.students[0].id, course.students[2].id]
+        session[Const.DASHBOARD_ENDDATE] = DTime.datetimeencode(datetime(2020, 1, 12))
+        dashbrd = Dashboard.querycriteria()
+        self.assertEqual([c.label for c in dashbrd.querycourses()], ["Formation 1"])
+        numanswers = dashbrd.querynumanswers()
+        self.assertEqual(len(numanswers), 1)
+        self.assertEqual(numanswers[0].count, 2)
+        self.assertEqual(numanswers[0].average, 2.0)
+        self.assertEqual([len(textanswer.polarities) for textanswer in dashbrd.querytextanswers()], [2])
+        rows = dashbrd.queryexportrows(chunksize=5).all()
+        self.assertEqual({(row.course, row.form) for row in rows}, {("Formation 1", "Semaine 1")})
+
+    def getdata(self, criteria: dict) -> dict:
+        client = app.test_client()
+        with client.session_transaction() as clientsession:
+            clientsession.update(criteria)
+        response = client.get("/dashboard/data")
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_data_nothing_selected(self):
+        data = self.getdata({})
+        self.assertEqual(sorted(data.keys()), ["numgraphs", "textgraphs"])
+        # one grade and one text question per course, 3 students over 2 weeks
+        self.assertEqual(len(data["numgraphs"]), 2)
+        numgraph = data["numgraphs"][0]
+        self.assertEqual(numgraph["title"], ["Note ?"])
+        self.assertEqual((numgraph["grades"], numgraph["counts"], numgraph["max"]), ([0, 1, 2, 3], [0, 2, 2, 2], 3))
+        self.assertEqual(numgraph["stats"], {"question": "Note ?", "count": 6, "average": 2.0, "std": 0.82,
+                                             "median": 2.0, "first": 1.25, "last": 2.75})
+        self.assertEqual([len(textgraph["points"]) for textgraph in data["textgraphs"]], [6, 6])
+        self.assertEqual(data["textgraphs"][0]["title"], ["Commentaire ?"])
+        polarity, subjectivity = data["textgraphs"][0]["points"][0]
+        self.assertTrue(-1 <= polarity <= 1 and 0 <= subjectivity <= 1)
+
+    def test_data_selection(self):
+        course = db.session.query(Course).filter(Course.label == "Formation 1").one()
+        data = self.getdata({Const.DASHBOARD_COURSE_IDS: [course.id],
+                             Const.DASHBOARD_STUDENT_IDS: [course.students[0].id, course.students[2].id],
+                             Const.DASHBOARD_STARTDATE: DTime.datetimeencode(DTime.min()),
+                             Const.DASHBOARD_ENDDATE: DTime.datetimeencode(datetime(2020, 1, 12))})
+        # the first week of students 1 and 3 : grades 1 and 3
+        self.assertEqual(len(data["numgraphs"]), 1)
+        numgraph = data["numgraphs"][0]
+        self.assertEqual((numgraph["grades"], numgraph["counts"]), ([0, 1, 2, 3], [0, 1, 0, 1]))
+        self.assertEqual((numgraph["stats"]["count"], numgraph["stats"]["average"]), (2, 2.0))
+        self.assertEqual([len(textgraph["points"]) for textgraph in data["textgraphs"]], [2])
+        # no answer in the dates : questions without statistics
+        data = self.getdata({Const.DASHBOARD_STARTDATE: DTime.datetimeencode(datetime(2021, 1, 1)),
+                             Const.DASHBOARD_ENDDATE: DTime.datetimeencode(DTime.max())})
+        self.assertEqual([(numgraph["counts"], numgraph["stats"]["count"], numgraph["stats"]["average"])
+                          for numgraph in data["numgraphs"]], [([0], 0, None)] * 2)
+        self.assertEqual([textgraph["points"] for textgraph in data["textgraphs"]], [[], []])
+
+    def export(self, criteria: dict, exportformat: str) -> list:
+        client = app.test_client()
+        with client.session_transaction() as clientsession:
+            clientsession.update(criteria)
+        app.config["EXPORT_CHUNK_SIZE"] = 5
+        try:
+            response = client.get(f"/dashboard/export?format={exportformat}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, AnswersExport.MIMETYPES[exportformat])
+            self.assertTrue(response.headers["Content-Disposition"].endswith(f".{exportformat}"))
+            # streamed chunk by chunk
+            self.assertTrue(response.is_streamed)
+            chunks = [chunk for chunk in response.iter_encoded() if chunk]
+        finally:
+            app.config.pop("EXPORT_CHUNK_SIZE")
+        return chunks
+
+    def test_export_csv(self):
+        chunks = self.export({}, AnswersExport.FORMAT_CSV)
+        lines = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+        self.assertEqual(lines[0], AnswersExport.COLUMNS)
+        self.assertEqual(len(lines), 1 + 24)
+        self.assertEqual(len(chunks), 5)  # 24 answers by 5
+        self.assertEqual(lines[1], ["Formation 0", "Semaine 1", "etudiant0.formation0@gmail.com", "Note ?",
+                                    "2020-01-10 00:00:00+00:00", "1"])
+
+    def test_export_parquet(self):
+        course = db.session.query(Course).filter(Course.label == "Formation 1").one()
+        chunks = self.export({Const.DASHBOARD_COURSE_IDS: [course.id],
+                              Const.DASHBOARD_STUDENT_IDS: [course.students[0].id, course.students[2].id],
+                              Const.DASHBOARD_STARTDATE: DTime.datetimeencode(DTime.min()),
+                              Const.DASHBOARD_ENDDATE: DTime.datetimeencode(datetime(2020, 1, 12))},
+                             AnswersExport.FORMAT_PARQUET)
+        self.assertGreater(len(chunks), 1)
+        rows = pq.read_table(io.BytesIO(b"".join(chunks))).to_pylist()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({(row["course"], row["form"]) for row in rows}, {("Formation 1", "Semaine 1")})
+        self.assertEqual({row["student"] for row in rows},
+                         {"etudiant0.formation1@gmail.com", "etudiant2.formation1@gmail.com"})
+        self.assertEqual({row["timestamp"] for row in rows}, {datetime(2020, 1, 10, tzinfo=timezone.utc)})
+
+    def test_export_unknown_format(self):
+        response = app.test_client().get("/dashboard/export?format=xlsx")
+        self.assertEqual(response.status_code, 302)
+
+
+if __name__ == "__main__":
+    unittest.main()
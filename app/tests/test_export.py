@@ -0,0 +1,54 @@
+import csv
+import io
+import unittest
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pyarrow.parquet as pq
+
+from app import app
+from app.exports.exportutils import AnswersExport
+
+Row = namedtuple("Row", AnswersExport.COLUMNS)
+
+
+def makerows(count: int):
+    return (Row(course="Data Analyst", form="Semaine 1", student=f"student{index}@gmail.com",
+                question="Qu'avez-vous pensé du cours ?", timestamp=datetime(2020, 1, 1, 8, index % 60),
+                text=f"Réponse, \"numéro\" {index}") for index in range(count))
+
+
+class ExportTests(unittest.TestCase):
+
+    def setUp(self):
+        app.config["EXPORT_CHUNK_SIZE"] = 7
+
+    def tearDown(self):
+        app.config.pop("EXPORT_CHUNK_SIZE")
+
+    def test_csv(self):
+        chunks = list(AnswersExport.export(makerows(20), AnswersExport.FORMAT_CSV))
+        lines = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+        self.assertEqual(lines[0], AnswersExport.COLUMNS)
+        self.assertEqual(len(lines), 21)
+        self.assertEqual(lines[20], ["Data Analyst", "Semaine 1", "student19@gmail.com",
+                                     "Qu'avez-vous pensé du cours ?", "2020-01-01 08:19:00+00:00", "Réponse, \"numéro\" 19"])
+
+    def test_parquet(self):
+        data = b"".join(AnswersExport.export(makerows(20), AnswersExport.FORMAT_PARQUET))
+        parquetfile = pq.ParquetFile(io.BytesIO(data))
+        self.assertEqual(parquetfile.num_row_groups, 3)
+        # naive UTC timestamps read back with their timezone
+        self.assertEqual(parquetfile.read().to_pylist(),
+                         [{**row._asdict(), "timestamp": row.timestamp.replace(tzinfo=timezone.utc)}
+                          for row in makerows(20)])
+
+    def test_empty(self):
+        data = b"".join(AnswersExport.export(makerows(0), AnswersExport.FORMAT_PARQUET))
+        self.assertEqual(pq.read_table(io.BytesIO(data)).num_rows, 0)
+        self.assertEqual(b"".join(AnswersExport.export(makerows(0), AnswersExport.FORMAT_CSV)),
+                         (",".join(AnswersExport.COLUMNS) + "\r\n").encode("utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
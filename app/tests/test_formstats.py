@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime
+
+from app import app, db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
+from app.database.dbutils import DbForm, DbFormStat
+from app.database.models import Course, FormStat, Student
+from testutils import DbTestCase
+
+
+class FormStatTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        self.client, emailsdict = FakeClient.generate(courses=1, tabs=2, rows=10, questions=4)
+        ApiClient.setclient(self.client)
+        course = Course(label="Formation", startdate=datetime(2019, 1, 1), enddate=datetime(2100, 1, 1),
+                        fileid="fake-file-0", filename="fake-file-0", filetz="Europe/Paris")
+        course.students = [Student(lastname="Nom", firstname="Prénom", email=email)
+                           for email in emailsdict["fake-file-0"]]
+        db.session.add(course)
+        db.session.commit()
+
+    # executed after each test
+    def tearDown(self):
+        ApiClient.setclient(None)
+        app.config.pop("ANSWERS_BULK_UPSERT", None)
+        super().tearDown()
+
+    def sync(self):
+        success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertTrue(success and all(report.success for report in reports))
+
+    def stats(self) -> dict:
+        return {(stat.form_id, stat.question_id): (stat.answerscount, stat.gradescount, stat.gradessum,
+                                                   stat.grademax, stat.histogram)
+                for stat in db.session.query(FormStat)}
+
+    def checkstats(self):
+        # the statistics maintained by the synchronization are those computed from the answers
+        stats = self.stats()
+        DbFormStat.rebuild()
+        db.session.commit()
+        self.assertEqual(stats, self.stats())
+        return stats
+
+    def changesheets(self):
+        wsheet = self.client.spreadsheets["fake-file-0"].wsheets[0]
+        # a new row of the first student answering again, then this answer edited (the sheet read again)
+        wsheet.rows.append(["31/12/2019 10:00:00", wsheet.rows[1][1], "5", "Modifiée", "", "Modifiée"])
+        self.sync()
+        self.checkstats()
+        wsheet.rows[-1] = ["31/12/2019 11:00:00", wsheet.rows[1][1], "2"] + wsheet.rows[-1][3:]
+        self.sync()
+
+    def test_bulk(self):
+        self.sync()
+        stats = self.checkstats()
+        self.assertEqual(len(stats), 2 * 4)
+        # grades of the first question of the first form : (rownum + 0) % 5 + 1
+        histogram = {str(grade): 2 for grade in range(1, 6)}
+        self.assertIn((10, 10, 30, 5, histogram), stats.values())
+        self.changesheets()
+        stats = self.checkstats()
+        # the first student's grades 1 and 3 replaced by 2 and an empty answer
+        self.assertIn((10, 10, 31, 5, {"1": 1, "2": 3, "3": 2, "4": 2, "5": 2}), stats.values())
+        self.assertIn((10, 9, 27, 5, {"1": 2, "2": 2, "3": 1, "4": 2, "5": 2}), stats.values())
+
+    def test_orm(self):
+        app.config["ANSWERS_BULK_UPSERT"] = False
+        self.sync()
+        self.checkstats()
+        self.changesheets()
+        self.checkstats()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app import app
+from app.apputils import ProcessPools
+from app.graphs.graphutils import GraphCache, GraphSpec
+
+
+def makespecs():
+    grades = GraphSpec(kind=GraphCache.KIND_GRADES, title="Note ?",
+                       data={"grades": [0, 1, 2, 3], "counts": [0, 3, 1, 2], "max": 3})
+    sentiments = GraphSpec(kind=GraphCache.KIND_SENTIMENTS, title="Commentaire ?",
+                           data={"polarities": [0.5, -0.2], "subjectivities": [0.3, 0.9]})
+    return [grades, sentiments, grades]
+
+
+class GraphsTests(unittest.TestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        self.staticfolder = app.static_folder
+        self.tempdir = tempfile.TemporaryDirectory()
+        app.static_folder = self.tempdir.name
+
+    # executed after each test
+    def tearDown(self):
+        app.static_folder = self.staticfolder
+        self.tempdir.cleanup()
+
+    def test_names_in_spec_order(self):
+        specs = makespecs()
+        names = GraphCache.getgraphs(specs, workers=1)
+        self.assertEqual(names, [GraphCache.graphname(kind=spec.kind, title=spec.title, data=spec.data)
+                                 for spec in specs])
+        self.assertEqual(names[0], names[2])
+        self.assertNotEqual(names[0], names[1])
+        self.assertEqual(sorted(os.listdir(GraphCache.folder())), sorted(set(names)))
+
+    def test_same_graph_drawn_once(self):
+        with mock.patch.object(GraphCache, "drawall") as drawall:
+            GraphCache.getgraphs(makespecs(), workers=1)
+        todraw = drawall.call_args.args[0]
+        self.assertEqual(len(todraw), 2)
+        # cached graphs not drawn again
+        GraphCache.getgraphs(makespecs(), workers=1)
+        with mock.patch.object(GraphCache, "drawall") as drawall:
+            GraphCache.getgraphs(makespecs(), workers=1)
+        self.assertEqual(drawall.call_args.args[0], {})
+
+    def test_parallel_same_as_serial(self):
+        specs = makespecs()
+        parallel = GraphCache.getgraphs(specs, workers=2)
+        parallelfiles = {name: os.path.getsize(os.path.join(GraphCache.folder(), name)) for name in parallel}
+        # the process pool kept for the next requests
+        self.assertIn((GraphCache.POOL_NAME, 2), ProcessPools.executors)
+        for name in set(parallel):
+            os.remove(os.path.join(GraphCache.folder(), name))
+        serial = GraphCache.getgraphs(specs, workers=1)
+        self.assertEqual(serial, parallel)
+        self.assertEqual({name: os.path.getsize(os.path.join(GraphCache.folder(), name)) for name in serial},
+                         parallelfiles)
+
+    def test_content_addressed_names(self):
+        grades, sentiments, _ = makespecs()
+        name = GraphCache.graphname(kind=grades.kind, title=grades.title, data=grades.data)
+        self.assertTrue(name.startswith(GraphCache.PREFIX) and name.endswith(".jpg"))
+        self.assertEqual(name, GraphCache.graphname(kind=grades.kind, title=grades.title, data=dict(grades.data)))
+        self.assertNotEqual(name, GraphCache.graphname(kind=grades.kind, title="Note finale ?", data=grades.data))
+        self.assertNotEqual(name, GraphCache.graphname(kind=grades.kind, title=grades.title,
+                                                       data={**grades.data, "counts": [0, 3, 1, 3]}))
+
+    def test_least_recently_used_evicted(self):
+        folder = GraphCache.folder()
+        paths = [os.path.join(folder, f"{GraphCache.PREFIX}{num}.jpg") for num in range(4)]
+        for num, path in enumerate(paths):
+            with open(path, "wb") as file:
+                file.write(b"x" * 100)
+            os.utime(path, (1000 + num, 1000 + num))
+        # temporary file left by a crash, other files ignored
+        orphan = os.path.join(folder, f"{GraphCache.PREFIX}tmp_abc.jpg")
+        with open(orphan, "wb") as file:
+            file.write(b"x" * 100)
+        os.utime(orphan, (500, 500))
+        other = os.path.join(folder, "other.jpg")
+        with open(other, "wb") as file:
+            file.write(b"x" * 1000)
+        os.utime(paths[0])  # used again
+        app.config["GRAPH_CACHE_MAX_BYTES"] = 250
+        try:
+            self.assertEqual(GraphCache.evict(), [orphan, paths[1], paths[2]])
+        finally:
+            app.config.pop("GRAPH_CACHE_MAX_BYTES")
+        self.assertEqual(sorted(os.listdir(folder)), sorted(["other.jpg", os.path.basename(paths[0]),
+                                                             os.path.basename(paths[3])]))
+
+    def test_graph_being_drawn_kept(self):
+        folder = GraphCache.folder()
+        path = os.path.join(folder, f"{GraphCache.PREFIX}0.jpg")
+        with open(path, "wb") as file:
+            file.write(b"x" * 100)
+        os.utime(path, (1000, 1000))
+        # temporary file of a concurrent drawing, older than the graph used since
+        drawing = os.path.join(folder, f"{GraphCache.TEMP_PREFIX}abc.jpg")
+        with open(drawing, "wb") as file:
+            file.write(b"x" * 100)
+        mtime = time.time() - GraphCache.TEMP_GRACE_SECONDS / 2
+        os.utime(drawing, (mtime, mtime))
+        os.utime(path)
+        app.config["GRAPH_CACHE_MAX_BYTES"] = 50
+        try:
+            self.assertEqual(GraphCache.evict(), [path])
+        finally:
+            app.config.pop("GRAPH_CACHE_MAX_BYTES")
+        self.assertEqual(os.listdir(folder), [os.path.basename(drawing)])
+
+    def test_evicted_graph_drawn_again(self):
+        specs = makespecs()[:1]
+        name = GraphCache.getgraphs(specs, workers=1)[0]
+        # deleted by a concurrent eviction after the name was computed
+        realutime = os.utime
+
+        def utime(path, *args, **kwargs):
+            if os.path.basename(path) == name and os.path.exists(path):
+                os.remove(path)
+            return realutime(path, *args, **kwargs)
+
+        with mock.patch("os.utime", side_effect=utime):
+            self.assertEqual(GraphCache.getgraphs(specs, workers=1), [name])
+        self.assertTrue(os.path.exists(os.path.join(GraphCache.folder(), name)))
+
+    def test_cached_by_browsers(self):
+        name = GraphCache.getgraphs(makespecs()[:1], workers=1)[0]
+        response = app.test_client().get(f"/graphs/{name}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "image/jpeg")
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=31536000")
+        response.close()
+        self.assertEqual(app.test_client().get("/graphs/graph_unknown.jpg").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
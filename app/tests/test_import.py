@@ -0,0 +1,158 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import openpyxl
+
+from app import db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
+from app.apputils import Const
+from app.database.dbutils import DbForm
+from app.database.models import Answer, Course, Form, FormStat, Question, Student
+from app.imports.importutils import SheetFiles
+from testutils import DbTestCase
+
+HEADER = ["Horodateur", "Adresse e-mail", "Note ?", "Avis ?"]
+ROWS = [["18/03/2019 10:12:13", "a@gmail.com", "4", "Bien"],
+        ["18/03/2019 11:00:00", "b@gmail.com", "2", "Trop rapide"]]
+
+
+class ImportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_csv_tab_label_and_rows(self):
+        path = os.path.join(self.folder.name, "Data Analyst - Semaine 1.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.write("Horodateur,Adresse e-mail,Note ?\r\n18/03/2019 10:12:13,a@gmail.com,4\r\n,,\r\n")
+        sheets = [(sheetfile.sheetlabel, sheetfile.header, list(SheetFiles.chunks(sheetfile.rows)))
+                  for sheetfile in SheetFiles.readfile(path=path, filename="Data Analyst")]
+        self.assertEqual(sheets, [("Semaine 1", ["Horodateur", "Adresse e-mail", "Note ?"],
+                                   [[["18/03/2019 10:12:13", "a@gmail.com", "4"]]])])
+
+    def test_xlsx_one_form_per_sheet(self):
+        path = os.path.join(self.folder.name, "Data Analyst.xlsx")
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Semaine 1"
+        workbook.active.append(["Horodateur", "Adresse e-mail", "Note ?", "Avis ?"])
+        workbook.active.append([datetime(2019, 3, 18, 10, 12, 13), "a@gmail.com", 4.0, None])
+        workbook.create_sheet("Semaine 2").append(["Horodateur", "Adresse e-mail", "Note ?"])
+        workbook.save(path)
+        sheets = [(sheetfile.sheetlabel, sheetfile.header, list(sheetfile.rows))
+                  for sheetfile in SheetFiles.readfile(path=path)]
+        self.assertEqual(sheets, [
+            ("Semaine 1", ["Horodateur", "Adresse e-mail", "Note ?", "Avis ?"],
+             [["18/03/2019 10:12:13", "a@gmail.com", "4"]]),
+            ("Semaine 2", ["Horodateur", "Adresse e-mail", "Note ?"], [])
+        ])
+
+    def test_unknown_extension(self):
+        with self.assertRaises(ValueError):
+            list(SheetFiles.readfile(path=os.path.join(self.folder.name, "Data Analyst.ods")))
+
+
+class ImportDbTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        self.course = Course(label="Data Analyst", startdate=datetime(2019, 1, 1), enddate=datetime(2100, 1, 1),
+                             fileid="fake-file-da", filename="Data Analyst", filetz="Europe/Paris")
+        self.course.students = [Student(lastname="Nom", firstname="Prénom", email=email)
+                                for email in ["a@gmail.com", "b@gmail.com"]]
+        db.session.add(self.course)
+        db.session.commit()
+
+    # executed after each test
+    def tearDown(self):
+        ApiClient.setclient(None)
+        self.folder.cleanup()
+        super().tearDown()
+
+    def writecsv(self, sheetlabel: str, rows: list) -> str:
+        path = os.path.join(self.folder.name, f"Data Analyst - {sheetlabel}.csv")
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            file.writelines(",".join(row) + "\r\n" for row in rows)
+        return path
+
+    def test_import_and_upsert(self):
+        reports = DbForm.importfile(course=self.course, path=self.writecsv("Semaine 1", [HEADER] + ROWS))
+        self.assertEqual([(report.success, report.sheetlabel, report.rowscount) for report in reports],
+                         [(True, "Semaine 1", 2)])
+        # questions inferred from the values, a form without sheet id yet
+        self.assertEqual({(question.text, question.isint) for question in db.session.query(Question)},
+                         {("Note ?", Const.DBTRUE), ("Avis ?", Const.DBFALSE)})
+        form = db.session.query(Form).one()
+        self.assertEqual((form.sheetid, form.sheetlabel, form.lastrowindex), (-1, "Semaine 1", 2))
+        self.assertEqual(db.session.query(Answer).count(), 4)
+        # imported again with a changed answer : updated, not duplicated
+        rows = [ROWS[0], ROWS[1][:2] + ["3", "Mieux"]]
+        DbForm.importfile(course=self.course, path=self.writecsv("Semaine 1", [HEADER] + rows))
+        self.assertEqual(db.session.query(Form).count(), 1)
+        self.assertEqual(sorted(answer.text for answer in db.session.query(Answer)), ["3", "4", "Bien", "Mieux"])
+        # another tab : the next placeholder sheet id
+        DbForm.importfile(course=self.course, path=self.writecsv("Semaine 2", [HEADER] + ROWS))
+        self.assertEqual(sorted(form.sheetid for form in db.session.query(Form)), [-2, -1])
+
+    def test_question_type_over_all_chunks(self):
+        # a text answer after the first chunk : the question is not an integer one
+        rows = ROWS + [["18/03/2019 12:00:00", "a@gmail.com", "Sans avis", "Bien"]]
+        with mock.patch.object(SheetFiles, "chunksize", return_value=2):
+            reports = DbForm.importfile(course=self.course, path=self.writecsv("Semaine 1", [HEADER] + rows))
+        self.assertEqual([(report.success, report.rowscount) for report in reports], [(True, 3)])
+        self.assertEqual({(question.text, question.isint) for question in db.session.query(Question)},
+                         {("Note ?", Const.DBFALSE), ("Avis ?", Const.DBFALSE)})
+        # grades of the first chunk not counted
+        stat = db.session.query(FormStat).join(Question).filter(Question.text == "Note ?").one()
+        self.assertEqual((stat.answerscount, stat.gradescount, stat.gradessum, stat.histogram), (2, 0, 0, {}))
+
+    def test_unknown_student_read_by_sync(self):
+        rows = [ROWS[0], ["18/03/2019 10:30:00", "c@gmail.com", "5", "Parfait"], ROWS[1]]
+        reports = DbForm.importfile(course=self.course, path=self.writecsv("Semaine 1", [HEADER] + rows))
+        self.assertEqual([(report.success, report.rowscount) for report in reports], [(True, 3)])
+        # the high-water mark stays on the row of the unknown student
+        form = db.session.query(Form).one()
+        self.assertEqual((form.lastrowindex, form.lastrowdt), (1, datetime(2019, 3, 18, 9, 12, 13)))
+        self.assertEqual(db.session.query(Answer).count(), 4)
+
+    def test_failed_sheet_rolls_back_the_file(self):
+        path = os.path.join(self.folder.name, "Data Analyst.xlsx")
+        workbook = openpyxl.Workbook()
+        workbook.active.title = "Semaine 1"
+        for row in [HEADER] + ROWS:
+            workbook.active.append(row)
+        # no email column
+        workbook.create_sheet("Semaine 2").append(["Horodateur", "Note ?"])
+        workbook["Semaine 2"].append(["18/03/2019 10:12:13", "4"])
+        workbook.save(path)
+        reports = DbForm.importfile(course=self.course, path=path)
+        self.assertEqual([(report.success, report.message.split(" :")[0]) for report in reports],
+                         [(False, "Info"), (False, "Erreur")])
+        self.assertEqual((db.session.query(Form).count(), db.session.query(Question).count(),
+                          db.session.query(Answer).count()), (0, 0, 0))
+
+    def test_form_adopted_by_sync(self):
+        DbForm.importfile(course=self.course, path=self.writecsv("Semaine 1", [HEADER] + ROWS))
+        # the same tab in the Google file, with one more row
+        client = FakeClient()
+        spreadsheet = client.addspreadsheet(key="fake-file-da", title="Data Analyst")
+        wsheet = client.addworksheet(spreadsheet=spreadsheet, title="Semaine 1",
+                                     rows=[HEADER] + ROWS + [["19/03/2019 09:00:00", "a@gmail.com", "5", "Revu"]])
+        ApiClient.setclient(client)
+        success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertTrue(success and all(report.success for report in reports))
+        form = db.session.query(Form).one()
+        self.assertEqual((form.sheetid, form.lastrowindex), (wsheet.id, 3))
+        self.assertEqual(sorted(answer.text for answer in db.session.query(Answer)), ["2", "5", "Revu", "Trop rapide"])
+
+
+if __name__ == "__main__":
+    unittest.main()
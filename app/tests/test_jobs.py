@@ -0,0 +1,108 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from app import app, db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
+from app.database.models import Answer, Course, Student
+from app.jobs.jobutils import SyncJobs
+from testutils import DbTestCase
+
+
+class GatedClient(FakeClient):
+    # API calls wait until the test opens the gate
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency=latency)
+        self.gate = threading.Event()
+
+    def call(self, method: str):
+        self.gate.wait(timeout=10)
+        super().call(method)
+
+
+class JobsTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        self.client, emailsdict = GatedClient.generate(courses=1, tabs=2, rows=5)
+        ApiClient.setclient(self.client)
+        course = Course(label="Formation", startdate=datetime(2019, 1, 1), enddate=datetime(2100, 1, 1),
+                        fileid="fake-file-0", filename="fake-file-0", filetz="Europe/Paris")
+        course.students = [Student(lastname="Nom", firstname="Prénom", email=email)
+                           for email in emailsdict["fake-file-0"]]
+        db.session.add(course)
+        db.session.commit()
+        self.maxjobskept = SyncJobs.MAX_JOBS_KEPT
+        SyncJobs.jobs.clear()
+
+    # executed after each test
+    def tearDown(self):
+        self.client.gate.set()
+        for thread in threading.enumerate():
+            if thread.name.startswith("sync-"):
+                thread.join(timeout=10)
+        SyncJobs.MAX_JOBS_KEPT = self.maxjobskept
+        ApiClient.setclient(None)
+        super().tearDown()
+
+    def start(self):
+        return SyncJobs.start(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+
+    def waitstatus(self, job, status: str):
+        deadline = time.monotonic() + 10
+        while job.status != status and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(job.status, status)
+
+    def test_lifecycle(self):
+        started, job = self.start()
+        self.assertTrue(started)
+        self.assertIn(job.status, ["PENDING", "RUNNING"])
+        self.waitstatus(job, "RUNNING")
+        # one sync at a time : the running job is returned
+        started, otherjob = self.start()
+        self.assertFalse(started)
+        self.assertIs(otherjob, job)
+        response = app.test_client().get(f"/sheets/job/{job.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "RUNNING")
+        # API calls allowed : the job ends
+        self.client.gate.set()
+        self.waitstatus(job, "DONE")
+        self.assertTrue(job.success)
+        data = app.test_client().get(f"/sheets/job/{job.id}").get_json()
+        self.assertEqual((data["status"], data["success"], data["sheetscount"], data["rowscount"]),
+                         ("DONE", True, 2, 10))
+        # messages flashed without a request
+        self.assertTrue(any(message.startswith("Succès : Réponses mises à jour") for message in data["messages"]))
+        self.assertTrue(data["messages"][-1].startswith("Info : API Google"))
+        self.assertEqual(db.session.query(Answer).count(), 2 * 5 * 3)
+        # another sync allowed
+        started, nextjob = self.start()
+        self.assertTrue(started)
+        self.assertNotEqual(nextjob.id, job.id)
+        self.waitstatus(nextjob, "DONE")
+
+    def test_unknown_job(self):
+        response = app.test_client().get("/sheets/job/unknown")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.get_json(), {"id": "unknown", "status": "UNKNOWN"})
+
+    def test_jobs_pruned(self):
+        SyncJobs.MAX_JOBS_KEPT = 2
+        self.client.gate.set()
+        jobs = list()
+        for count in range(4):
+            started, job = self.start()
+            self.assertTrue(started)
+            self.waitstatus(job, "DONE")
+            jobs.append(job)
+        # the oldest finished jobs forgotten
+        self.assertEqual([SyncJobs.get(job.id) for job in jobs], [None, None, jobs[2], jobs[3]])
+
+
+if __name__ == "__main__":
+    unittest.main()
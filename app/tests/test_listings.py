@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime
+
+from app import db
+from app.database.dbutils import DbCourse, DbStudent
+from app.database.models import Course, Student
+from testutils import DbTestCase
+
+
+class ListingsTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        # 3 courses starting the same day, of 7 students each
+        for coursenum in range(3):
+            course = Course(label=f"Formation {coursenum}", startdate=datetime(2020, 1, 6),
+                            enddate=datetime(2020, 6, 1), fileid=f"file-{coursenum}", filename=f"file-{coursenum}",
+                            filetz="Europe/Paris")
+            course.students = [Student(lastname=f"Nom_{num}", firstname="Prénom",
+                                       email=f"etudiant{num}.formation{coursenum}@gmail.com") for num in range(7)]
+            db.session.add(course)
+        db.session.commit()
+
+    def test_pages(self):
+        after, pages = None, list()
+        while True:
+            students, after = DbStudent.querypage(after=after, size=5)
+            pages.append([student.id for student in students])
+            if after is None:
+                break
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 1])
+        ids = [studentid for page in pages for studentid in page]
+        self.assertEqual(ids, [student.id for student in db.session.query(Student).order_by(
+            Student.course_id, Student.id)])
+        courses, after = DbCourse.querypage(after=None, size=2)
+        self.assertEqual([course.label for course in courses], ["Formation 0", "Formation 1"])
+        courses, after = DbCourse.querypage(after=after, size=2)
+        self.assertEqual(([course.label for course in courses], after), (["Formation 2"], None))
+        # unknown key : first page
+        self.assertEqual(len(DbStudent.querypage(after="x-y", size=5)[0]), 5)
+
+    def test_search(self):
+        students = DbStudent.search(text="nom_3 formation2", limit=10)
+        self.assertEqual([student.email for student in students], ["etudiant3.formation2@gmail.com"])
+        self.assertEqual(students[0].course.label, "Formation 2")
+        self.assertEqual(len(DbStudent.search(text="", limit=10)), 10)
+        # LIKE wildcards searched as such
+        self.assertEqual(DbStudent.search(text="%", limit=10), [])
+        self.assertEqual(len(DbStudent.search(text="_", limit=30)), 21)
+        self.assertEqual([course.label for course in DbCourse.search(text="FORMATION 1", limit=10)], ["Formation 1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
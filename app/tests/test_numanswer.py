@@ -0,0 +1,54 @@
+import math
+import unittest
+
+import numpy as np
+
+from app.apputils import NumAnswer
+from app.routes import gradesdata
+
+
+class NumAnswerTests(unittest.TestCase):
+
+    def test_statistics_same_as_numpy(self):
+        histogram = {1: 3, 2: 1, 4: 5, 5: 2}
+        grades = np.repeat(list(histogram.keys()), list(histogram.values()))
+        numanswer = NumAnswer.fromhistogram(questiontext="Note ?", histogram=histogram)
+        self.assertEqual(numanswer.count, len(grades))
+        self.assertEqual(numanswer.max, 5)
+        self.assertAlmostEqual(numanswer.average, grades.mean())
+        self.assertAlmostEqual(numanswer.std, grades.std())
+        self.assertAlmostEqual(numanswer.median, np.median(grades))
+        qs = [0, 10, 25, 33, 75, 90, 100]
+        np.testing.assert_allclose(numanswer.percentiles(qs), np.percentile(grades, qs))
+
+    def test_fixed_bins_histogram(self):
+        numanswer = NumAnswer.fromhistogram(questiontext="Note ?", histogram={1: 3, 4: 5, 12: 1})
+        self.assertEqual(numanswer.histogram().tolist(), [0, 3, 0, 0, 5, 0, 0, 0, 0, 0, 0, 0, 1])
+        self.assertEqual(numanswer.histogram(first=1, last=5).tolist(), [3, 0, 0, 5, 0])
+
+    def test_large_grades(self):
+        # integer answers out of a grading scale : years, postcodes, phone numbers
+        histogram = {-3: 1, 2019: 3, 75001: 2, 612345678: 1}
+        grades = np.repeat(list(histogram.keys()), list(histogram.values()))
+        numanswer = NumAnswer.fromhistogram(questiontext="Année ?", histogram=histogram)
+        self.assertEqual((numanswer.min, numanswer.max), (-3, 612345678))
+        self.assertAlmostEqual(numanswer.average, grades.mean())
+        self.assertAlmostEqual(numanswer.median, np.median(grades))
+        self.assertEqual(numanswer.histogram(first=2019, last=2020).tolist(), [3, 0])
+        # distinct grades drawn instead of a bin per value
+        data = gradesdata(numanswer)
+        self.assertEqual((data["grades"], data["counts"]), ([-3, 2019, 75001, 612345678], [1, 3, 2, 1]))
+        data = gradesdata(NumAnswer.fromhistogram(questiontext="Note ?", histogram={1: 3, 3: 1}))
+        self.assertEqual((data["grades"], data["counts"]), ([0, 1, 2, 3], [0, 3, 0, 1]))
+
+    def test_no_answer(self):
+        numanswer = NumAnswer.fromhistogram(questiontext="Note ?", histogram={})
+        self.assertEqual(numanswer.count, 0)
+        self.assertEqual(numanswer.max, 0)
+        self.assertTrue(math.isnan(numanswer.average))
+        self.assertTrue(math.isnan(numanswer.median))
+        self.assertEqual(numanswer.histogram().tolist(), [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
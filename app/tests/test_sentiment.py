@@ -0,0 +1,29 @@
+import unittest
+
+from app.apputils import ProcessPools
+from app.nlp.nlputils import SentimentAnalyzer
+
+
+class SentimentTests(unittest.TestCase):
+
+    def test_batch_same_as_serial(self):
+        texts = ["Très bon cours", "Formateur ennuyeux", "", "Exercices intéressants mais trop longs"] * 150
+        serial = SentimentAnalyzer.scorebatch(texts, workers=1)
+        parallel = SentimentAnalyzer.scorebatch(texts, workers=2)
+        self.assertEqual(len(serial), len(texts))
+        self.assertEqual(serial, parallel)
+        # the process pool and its loaded tools kept for the next batches
+        executor = ProcessPools.executors[(SentimentAnalyzer.POOL_NAME, 2)]
+        self.assertEqual(SentimentAnalyzer.scorebatch(texts, workers=2), serial)
+        self.assertIs(ProcessPools.executors[(SentimentAnalyzer.POOL_NAME, 2)], executor)
+        # another size : another pool
+        self.assertEqual(SentimentAnalyzer.scorebatch(texts, workers=3), serial)
+        self.assertIsNot(ProcessPools.executors[(SentimentAnalyzer.POOL_NAME, 3)], executor)
+
+    def test_hash_depends_on_text_only(self):
+        self.assertEqual(SentimentAnalyzer.hashtext("Très bien"), SentimentAnalyzer.hashtext("Très bien"))
+        self.assertNotEqual(SentimentAnalyzer.hashtext("Très bien"), SentimentAnalyzer.hashtext("Très bien "))
+
+
+if __name__ == "__main__":
+    unittest.main()
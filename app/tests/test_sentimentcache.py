@@ -0,0 +1,65 @@
+import unittest
+from unittest import mock
+
+from app import db
+from app.database.dbutils import DbSentiment
+from app.database.models import Sentiment
+from app.nlp.nlputils import SentimentAnalyzer
+from testutils import DbTestCase
+
+
+def fakescores(texts, workers=None):
+    return [(len(text) / 100, 0.5) for text in texts]
+
+
+class SentimentCacheTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        # texts analysed by the fake : the texts sent to the analyzer recorded
+        patcher = mock.patch.object(SentimentAnalyzer, "scorebatch", side_effect=fakescores)
+        self.scorebatch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def analysed(self) -> list:
+        res = [text for call in self.scorebatch.call_args_list for text in call.args[0]]
+        self.scorebatch.reset_mock()
+        return res
+
+    def test_hits_and_misses(self):
+        sentiments = DbSentiment.getsentiments(["Très bien", "Bof", "Très bien"])
+        self.assertEqual(sentiments, {"Très bien": (0.09, 0.5), "Bof": (0.03, 0.5)})
+        # identical texts analysed and stored once
+        self.assertEqual(self.analysed(), ["Très bien", "Bof"])
+        self.assertEqual(db.session.query(Sentiment).count(), 2)
+        # cached texts not analysed again
+        sentiments = DbSentiment.getsentiments(["Bof", "Nul"])
+        self.assertEqual(sentiments, {"Bof": (0.03, 0.5), "Nul": (0.03, 0.5)})
+        self.assertEqual(self.analysed(), ["Nul"])
+        self.assertEqual(db.session.query(Sentiment).count(), 3)
+
+    def test_chunks(self):
+        texts = [f"Réponse {num}" for num in range(8)]
+        with mock.patch.object(DbSentiment, "CHUNK_SIZE", 3):
+            DbSentiment.getsentiments(texts[:5])
+            self.analysed()
+            # hashes looked up by 3 : the cached texts of every chunk found
+            sentiments = DbSentiment.getsentiments(texts)
+        self.assertEqual(self.analysed(), texts[5:])
+        self.assertEqual(sentiments, {text: fakescores([text])[0] for text in texts})
+
+    def test_new_analyzer_version(self):
+        DbSentiment.getsentiments(["Très bien"])
+        self.analysed()
+        with mock.patch.object(SentimentAnalyzer, "version", return_value="textblob-fr 99"):
+            DbSentiment.getsentiments(["Très bien"])
+            self.assertEqual(self.analysed(), ["Très bien"])
+            DbSentiment.getsentiments(["Très bien"])
+            self.assertEqual(self.analysed(), [])
+        self.assertEqual(sorted(analyzer for analyzer, in db.session.query(Sentiment.analyzer)),
+                         [SentimentAnalyzer.version(), "textblob-fr 99"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from app.api.apiutils import ApiAccess
+from app.imports.importutils import SheetFrame
+
+
+class SheetFrameTests(unittest.TestCase):
+
+    def setUp(self):
+        header = ["Horodateur", "Adresse e-mail ", " Note ?", "Avis ?", "Commentaire ?"]
+        rows = [["18/03/2019 10:12:13", " a@gmail.com", "4", "Bien", "12"],
+                ["18/03/2019 11:00:00", "b@gmail.com", "5", "Très bien", "Rien"],
+                ["18/03/2019 12:00:00", "c@gmail.com", "3", "7"]]
+        self.sheetframe = SheetFrame.fromrecords(ApiAccess.torecords(header, rows))
+
+    def test_columns(self):
+        self.assertEqual(self.sheetframe.rowscount, 3)
+        self.assertEqual(self.sheetframe.header, ["Horodateur", "Adresse e-mail", "Note ?", "Avis ?", "Commentaire ?"])
+        self.assertEqual(self.sheetframe.column("Note ?"), [4, 5, 3])
+        self.assertEqual(self.sheetframe.texts("Adresse e-mail"), ["a@gmail.com", "b@gmail.com", "c@gmail.com"])
+        self.assertEqual(self.sheetframe.texts("Commentaire ?"), ["12", "Rien", ""])
+
+    def test_integer_questions(self):
+        self.assertTrue(self.sheetframe.isint("Note ?"))
+        self.assertFalse(self.sheetframe.isint("Avis ?"))
+        self.assertFalse(self.sheetframe.isint("Commentaire ?"))  # empty answer
+
+    def test_negative_and_unicode_numbers(self):
+        header = ["Ecart ?", "Puissance ?", "Part ?"]
+        sheetframe = SheetFrame.fromrecords(ApiAccess.torecords(header, [["-2", "²", "½"], ["3", "2", "1"]]))
+        # numericised by get_all_records
+        self.assertEqual(sheetframe.column("Ecart ?"), [-2, 3])
+        self.assertTrue(sheetframe.isint("Ecart ?"))
+        # numeric characters int() does not read
+        self.assertFalse(sheetframe.isint("Puissance ?"))
+        self.assertFalse(sheetframe.isint("Part ?"))
+
+    def test_signed_integer_strings(self):
+        # records not numericised : strings read as the API numbers
+        records = [{"Ecart ?": "-2", "Note ?": "4", "Puissance ?": "²", "Code ?": "1_000"},
+                   {"Ecart ?": " +3 ", "Note ?": 5, "Puissance ?": "2", "Code ?": "2"}]
+        sheetframe = SheetFrame.fromrecords(records)
+        self.assertTrue(sheetframe.isint("Ecart ?"))
+        self.assertTrue(sheetframe.isint("Note ?"))
+        self.assertFalse(sheetframe.isint("Puissance ?"))
+        self.assertFalse(sheetframe.isint("Code ?"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+import unittest
+
+LAZY_MODULES = ["matplotlib", "pandas", "plotnine", "textblob", "textblob_fr", "nltk"]
+
+
+class StartupTests(unittest.TestCase):
+
+    def test_heavy_libraries_not_imported(self):
+        # a fresh interpreter, this test process may already have loaded them
+        code = f"import sys, app; print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+        completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertEqual(completed.stdout.strip(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
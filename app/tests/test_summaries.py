@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app import db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
+from app.database.dbutils import DbCourse, DbForm
+from app.database.models import Answer, Course, Student
+from testutils import DbTestCase
+
+
+class SummariesTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        self.client, emailsdict = FakeClient.generate(courses=2, tabs=3, rows=6)
+        ApiClient.setclient(self.client)
+        for fileid, emails in emailsdict.items():
+            course = Course(label=f"Formation {fileid}", startdate=datetime(2019, 1, 1),
+                            enddate=datetime(2100, 1, 1), fileid=fileid, filename=fileid, filetz="Europe/Paris")
+            course.students = [Student(lastname="Nom", firstname="Prénom", email=email) for email in emails]
+            db.session.add(course)
+        # a course whose file has no sheet
+        self.client.addspreadsheet(key="empty", title="empty")
+        db.session.add(Course(label="Formation vide", startdate=datetime(2019, 1, 1), enddate=datetime(2100, 1, 1),
+                              fileid="empty", filename="empty", filetz="Europe/Paris"))
+        db.session.commit()
+        # a sheet answered by 2 students only
+        del self.client.spreadsheets["fake-file-1"].wsheets[1].rows[3:]
+        self.sync()
+        # a student answering a sheet a second time
+        wsheet = self.client.spreadsheets["fake-file-0"].wsheets[0]
+        wsheet.rows.append(["31/12/2019 10:00:00"] + wsheet.rows[1][1:])
+        self.sync()
+
+    # executed after each test
+    def tearDown(self):
+        ApiClient.setclient(None)
+        super().tearDown()
+
+    def sync(self):
+        success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertTrue(success and all(report.success for report in reports))
+
+    def test_forms_same_as_answers(self):
+        respondents = dict(db.session.query(Answer.form_id, func.count(func.distinct(Answer.student_id))).group_by(
+            Answer.form_id).all())
+        summaries = DbForm.queryforms(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertEqual(len(summaries), 2 * 3 + 1)
+        for summary in summaries:
+            self.assertEqual(summary.formscount, len(summary.course.forms))
+            if summary.form is None:
+                self.assertEqual(summary.course.label, "Formation vide")
+            else:
+                self.assertEqual(summary.answerscount, respondents.get(summary.form.id, 0))
+        self.assertEqual(sorted(summary.answerscount for summary in summaries), [0, 2, 6, 6, 6, 6, 6])
+
+    def test_courses_same_as_forms(self):
+        summaries = DbCourse.querycourses(minenddate=datetime(2000, 1, 1))
+        self.assertEqual(len(summaries), 3)
+        for summary in summaries:
+            forms = summary.course.forms
+            self.assertEqual(summary.formscount, len(forms))
+            if forms:
+                self.assertEqual(summary.lastentrydt, max(form.lastentrydt for form in forms))
+                self.assertEqual(summary.lastreaddt, max(form.lastreaddt for form in forms))
+        self.assertEqual([summary.formscount for summary in summaries], [3, 3, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
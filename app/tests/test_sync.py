@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.api.apiutils import ApiClient
+from app.api.fakegspread import FakeClient
+from app.database.dbutils import DbAnswer, DbForm
+from app.database.models import Answer, Course, Form, Student
+from testutils import DbTestCase
+
+
+class SyncTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        self.client, emailsdict = FakeClient.generate(courses=2, tabs=3, rows=20, questions=4)
+        ApiClient.setclient(self.client)
+        for coursenum, (key, emails) in enumerate(emailsdict.items()):
+            course = Course(label=f"Formation {coursenum}", startdate=datetime(2019, 1, 1),
+                            enddate=datetime(2100, 1, 1), fileid=key, filename=key, filetz="Europe/Paris")
+            course.students = [Student(lastname="Nom", firstname="Prénom", email=email) for email in emails]
+            db.session.add(course)
+        db.session.commit()
+
+    # executed after each test
+    def tearDown(self):
+        ApiClient.setclient(None)
+        super().tearDown()
+
+    def sync(self):
+        success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertTrue(success)
+        self.assertTrue(all(report.success for report in reports), [report.message for report in reports])
+        return reports
+
+    def test_full_then_incremental(self):
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 2 * 3 * 20)
+        self.assertEqual(db.session.query(Form).count(), 6)
+        self.assertEqual(db.session.query(Answer).count(), 2 * 3 * 20 * 4)
+        # one call to open the file, one to list its sheets, one to read them all
+        self.assertEqual(self.client.stats.total, 2 * 3)
+        # nothing new : no row read again
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 0)
+        # a new answer : only this row read
+        wsheet = self.client.spreadsheets["fake-file-0"].wsheets[0]
+        wsheet.rows.append(["31/12/2019 10:00:00", wsheet.rows[1][1], "5", "Modifiée", "5", "Modifiée"])
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 1)
+        answer = db.session.query(Answer).join(Student).filter(
+            Student.email == wsheet.rows[1][1], Answer.text == "Modifiée").first()
+        self.assertIsNotNone(answer)
+        self.assertEqual(db.session.query(Answer).count(), 2 * 3 * 20 * 4)
+
+    def test_rows_changed_before_high_water_mark(self):
+        self.sync()
+        # last row read replaced : the file's sheets are read after the high-water mark, then this one entirely
+        wsheet = self.client.spreadsheets["fake-file-1"].wsheets[2]
+        wsheet.rows[-1] = ["31/12/2019 10:00:00"] + wsheet.rows[-1][1:]
+        callsbefore = self.client.stats.calls["values_batch_get"]
+        reports = self.sync()
+        self.assertEqual(self.client.stats.calls["values_batch_get"] - callsbefore, 3)
+        self.assertEqual(sum(report.rowscount for report in reports), 20)
+        # last row read deleted : the sheet has less rows than read, entirely read at once
+        del wsheet.rows[-1]
+        callsbefore = self.client.stats.calls["values_batch_get"]
+        reports = self.sync()
+        self.assertEqual(self.client.stats.calls["values_batch_get"] - callsbefore, 2)
+        self.assertEqual(sum(report.rowscount for report in reports), 19)
+
+    def test_unknown_student_read_again(self):
+        # 5th respondent not yet a student : the high-water mark stays on his row
+        student = db.session.query(Student).filter(Student.email == "etudiant4.formation0@gmail.com").one()
+        course = student.course
+        db.session.delete(student)
+        db.session.commit()
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 2 * 3 * 20)
+        self.assertEqual(db.session.query(Answer).count(), (2 * 3 * 20 - 3) * 4)
+        self.assertEqual(sorted(gform.lastrowindex for gform in course.forms), [4, 4, 4])
+        # student added : his rows and the following ones read again
+        course.students.append(Student(lastname="Nom", firstname="Prénom", email="etudiant4.formation0@gmail.com"))
+        db.session.commit()
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 3 * 16)
+        self.assertEqual(db.session.query(Answer).count(), 2 * 3 * 20 * 4)
+        self.assertEqual(sorted(gform.lastrowindex for gform in course.forms), [20, 20, 20])
+
+    def test_answers_without_unique_key(self):
+        # database not upgraded : answers table without its unique key, holding duplicate answers
+        Answer.__table__.drop(bind=db.engine)
+        legacy = db.MetaData()
+        db.Table(Answer.__tablename__, legacy, *[db.Column(column.name, column.type, primary_key=column.primary_key,
+                                                           nullable=column.nullable)
+                                                 for column in Answer.__table__.columns])
+        legacy.create_all(bind=db.engine)
+        self.assertFalse(DbAnswer.bulkupsert())
+        self.sync()
+        answer = db.session.query(Answer).first()
+        db.session.add(Answer(timestamp=answer.timestamp, text=answer.text, form_id=answer.form_id,
+                              student_id=answer.student_id, question_id=answer.question_id))
+        db.session.commit()
+        # answers updated through the ORM
+        wsheet = self.client.spreadsheets["fake-file-0"].wsheets[0]
+        wsheet.rows.append(["31/12/2019 10:00:00", wsheet.rows[1][1], "5", "Modifiée", "5", "Modifiée"])
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 1)
+        self.assertEqual(db.session.query(Answer).filter(Answer.text == "Modifiée").count(), 2)
+
+    def test_upsert_failure_reported(self):
+        error = OperationalError("INSERT", {}, Exception("ON CONFLICT"))
+        with mock.patch.object(DbAnswer, "upsert", side_effect=error):
+            success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+        self.assertFalse(any(report.success for report in reports if not report.skipped))
+        self.assertEqual(db.session.query(Answer).count(), 0)
+        # nothing recorded as read : read again by the next synchronization
+        reports = self.sync()
+        self.assertEqual(sum(report.rowscount for report in reports), 2 * 3 * 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from datetime import datetime
+
+from app.database.dbutils import DbAnswer
+
+
+class TimestampTests(unittest.TestCase):
+
+    def test_local_times_to_utc(self):
+        values = ["30/03/2019 10:00:00", "31/03/2019 10:00:00", "1/4/2019 9:05:00", "30/03/2019 10:00:00"]
+        self.assertEqual(DbAnswer.parsetimestamps(values=values, tzname="Europe/Paris"),
+                         [datetime(2019, 3, 30, 9), datetime(2019, 3, 31, 8), datetime(2019, 4, 1, 7, 5),
+                          datetime(2019, 3, 30, 9)])
+
+    def test_malformed_values(self):
+        self.assertEqual(DbAnswer.parsetimestamps(values=["", "31/02/2019 10:00:00", "demain", 43500],
+                                                  tzname="Europe/Paris"), [None, None, None, None])
+
+    def test_unknown_timezone_is_utc(self):
+        self.assertEqual(DbAnswer.parsetimestamp("18/03/2019 10:12:13", tzname="Mars/Olympus"),
+                         datetime(2019, 3, 18, 10, 12, 13))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime
+
+from app import app, db
+from app.database.dbutils import Db, DbAnswer
+from app.database.models import Answer, Course, Form, FormStat, Question, Student
+from testutils import DbTestCase
+
+
+def legacycolumn(column: db.Column) -> db.Column:
+    res = column._copy()
+    res.unique = False
+    return res
+
+
+class UpgradeTests(DbTestCase):
+
+    # executed prior to each test
+    def setUp(self):
+        super().setUp()
+        db.drop_all()
+        # database of a previous version : no statistics table, no Forms.lastrowindex column,
+        # no unique constraint or index
+        legacy = db.MetaData()
+        for table in db.metadata.sorted_tables:
+            if table.name != FormStat.__tablename__:
+                db.Table(table.name, legacy, *[legacycolumn(column) for column in table.columns
+                                               if (table.name, column.name) != ("Forms", "lastrowindex")])
+        legacy.create_all(bind=db.engine)
+        db.session.execute(db.text(
+            "INSERT INTO Courses (id, label, startdate, enddate, fileid, filename, filetz) "
+            "VALUES (1, 'Formation', '2020-01-06 00:00:00', '2020-06-01 00:00:00', 'file', 'file', 'Europe/Paris')"))
+        db.session.execute(db.text(
+            "INSERT INTO Forms (id, sheetid, sheetlabel, lastentrydt, lastreaddt, course_id) "
+            "VALUES (1, 1, 'Semaine 1', '2020-01-10 00:00:00', '2020-01-10 00:00:00', 1)"))
+        db.session.commit()
+
+    def test_upgrade(self):
+        messages = Db.upgrade()
+        self.assertIn("Colonne Forms.lastrowindex ajoutée", messages)
+        self.assertIn("Index unique uq_answers_form_student_question ajouté", messages)
+        self.assertIn("Index ix_answers_question_form ajouté", messages)
+        # unnamed constraints of the columns unique=True
+        self.assertIn("Index unique uq_courses_fileid ajouté", messages)
+        self.assertIn("Index unique uq_forms_sheetid ajouté", messages)
+        self.assertIn("Statistiques des onglets calculées", messages)
+        inspector = db.inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            indexnames = {index["name"] for index in inspector.get_indexes(table.name)}
+            self.assertTrue({index.name for index in table.indexes} <= indexnames, table.name)
+        self.assertEqual(db.session.query(Form).one().lastrowindex, 0)
+        # nothing left to do
+        self.assertEqual(Db.upgrade(), [])
+
+    def test_unique_answers(self):
+        Db.upgrade()
+        course = db.session.get(Course, 1)
+        form = db.session.get(Form, 1)
+        student = Student(lastname="Nom", firstname="Prénom", email="etudiant@gmail.com", course=course)
+        question = Question(isint="Y", text="Note ?", course=course)
+        db.session.add(Answer(timestamp=datetime(2020, 1, 10), text="3", form=form, student=student,
+                              question=question))
+        db.session.commit()
+        db.session.add(Answer(timestamp=datetime(2020, 1, 11), text="4", form=form, student=student,
+                              question=question))
+        with self.assertRaises(Exception):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_duplicate_answers(self):
+        # a student answering twice before the unique key : the latest answer kept
+        db.session.execute(db.text("INSERT INTO Students (id, lastname, firstname, email, course_id) "
+                                   "VALUES (1, 'Nom', 'Prénom', 'etudiant@gmail.com', 1)"))
+        db.session.execute(db.text("INSERT INTO Questions (id, isint, text, course_id) VALUES (1, 'Y', 'Note ?', 1)"))
+        for answerid, text in [(1, "3"), (2, "5"), (3, "4")]:
+            db.session.execute(db.text(
+                "INSERT INTO Answers (id, timestamp, text, form_id, student_id, question_id) "
+                f"VALUES ({answerid}, '2020-01-10 00:00:0{answerid}', '{text}', 1, 1, 1)"))
+        db.session.commit()
+        messages = Db.upgrade()
+        self.assertIn("Réponses en double supprimées : 2 (dernière gardée)", messages)
+        self.assertIn("Index unique uq_answers_form_student_question ajouté", messages)
+        self.assertFalse(any(message.startswith("Erreur") for message in messages))
+        self.assertEqual([(answer.id, answer.text) for answer in db.session.query(Answer)], [(3, "4")])
+        stat = db.session.query(FormStat).one()
+        self.assertEqual((stat.answerscount, stat.gradessum), (1, 4))
+        # the synchronization upserts the answers again
+        self.assertTrue(DbAnswer.bulkupsert())
+
+    def test_command_fails_on_error(self):
+        # duplicates not deleted by the upgrade : the unique index not created
+        db.session.execute(db.text(
+            "INSERT INTO Courses (id, label, startdate, enddate, fileid, filename, filetz) "
+            "VALUES (2, 'Copie', '2020-01-06 00:00:00', '2020-06-01 00:00:00', 'file', 'file', 'Europe/Paris')"))
+        db.session.commit()
+        result = app.test_cli_runner().invoke(args=["upgrade-db"])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("Erreur : Index unique uq_courses_fileid non créé", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from app import app, db
+from conftest import TEST_DB_URI
+
+
+class DbTestCase(unittest.TestCase):
+    # tests run in a request context on an empty tests database, see conftest.py
+
+    # executed prior to each test
+    def setUp(self):
+        self.context = app.test_request_context()
+        self.context.push()
+        dburi = db.engine.url.render_as_string()
+        if dburi != TEST_DB_URI:
+            # the application imported before conftest.py (not run by pytest) : its database left untouched
+            self.context.pop()
+            raise RuntimeError(f"Base de test non utilisée ({dburi}) : lancer les tests par pytest")
+        db.drop_all()
+        db.create_all()
+
+    # executed after each test
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def usedatabase(dburi: str):
+    # the benchmark database replaces the configured one : to be called before the application is imported
+    from private.privateconfig import Config
+    Config.SQLALCHEMY_DATABASE_URI = dburi
+
+
+def measure(function: Callable, repeat: int = 3, before: Callable = None) -> (object, float, int):
+    # result, best wall time in seconds out of repeat runs and peak of the memory allocated by Python
+    # in bytes, measured by an additional run (tracing slows down the allocations).
+    # before is called ahead of each run, e.g. to empty a cache
+    seconds = None
+    res = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        res = function()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    if before is not None:
+        before()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return res, seconds, peak
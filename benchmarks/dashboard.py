@@ -0,0 +1,94 @@
+"""Dashboard benchmark : time and peak memory of each stage of /dashboard/analyze.
+
+Stages : criteria (Dashboard.querycriteria), grades (querynumanswers : query and aggregation),
+texts with the sentiments to compute then cached (querytextanswers), graphs to draw then cached
+(GraphCache.getgraphs) and the whole page. On a dataset of benchmarks/dataset.py, generated in a
+temporary SQLite database or read from --dburi (all courses and students selected).
+
+    python benchmarks/dashboard.py [--courses 5] [--students 100] [--forms 10] [--repeat 3]
+    python benchmarks/dashboard.py --dburi sqlite:////tmp/dataset.db
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from benchutils import measure, usedatabase
+from dataset import generate
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dburi", default=None, help="existing dataset (see dataset.py), left unchanged "
+                                                      "except for the cached sentiments")
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--students", type=int, default=100, help="students per course")
+    parser.add_argument("--forms", type=int, default=10, help="forms (weeks) per course")
+    parser.add_argument("--repeat", type=int, default=3, help="the best time is kept")
+    args = parser.parse_args()
+
+    folder = tempfile.TemporaryDirectory()
+    usedatabase(args.dburi or "sqlite:///" + os.path.join(folder.name, "benchmark.db"))
+    from flask import get_flashed_messages, session
+    from app import app, db
+    from app.apputils import Const, DTime
+    from app.database.dbutils import Dashboard
+    from app.database.models import Answer, Sentiment
+    from app.graphs.graphutils import GraphCache, GraphSpec
+    from app.routes import gradesdata
+
+    app.config["TESTING"] = True
+    app.static_folder = os.path.join(folder.name, "static")  # graphs cache
+    criteria = {Const.DASHBOARD_STARTDATE: DTime.datetimeencode(DTime.min()),
+                Const.DASHBOARD_ENDDATE: DTime.datetimeencode(DTime.max())}
+
+    with app.test_request_context():
+        if args.dburi is None:
+            db.create_all()
+            generate(courses=args.courses, students=args.students, forms=args.forms)
+        session.update(criteria)
+        print(f"{db.session.query(Answer).count()} réponses, meilleur temps sur {args.repeat} exécution(s)")
+        print(f"{'étape':<32}{'durée (s)':>10}{'mémoire max (Mo)':>18}")
+
+        def report(stage: str, seconds: float, peak: int):
+            print(f"{stage:<32}{seconds:>10.3f}{peak / 1024 / 1024:>18.1f}")
+
+        def clearsentiments():
+            db.session.query(Sentiment).delete()
+            db.session.commit()
+
+        def cleargraphs():
+            shutil.rmtree(GraphCache.folder(), ignore_errors=True)
+
+        dashbrd, seconds, peak = measure(Dashboard.querycriteria, repeat=args.repeat)
+        report("critères", seconds, peak)
+        numanswers, seconds, peak = measure(dashbrd.querynumanswers, repeat=args.repeat)
+        report("notes (requête, agrégation)", seconds, peak)
+        textanswers, seconds, peak = measure(dashbrd.querytextanswers, repeat=args.repeat, before=clearsentiments)
+        report("textes, sentiments calculés", seconds, peak)
+        textanswers, seconds, peak = measure(dashbrd.querytextanswers, repeat=args.repeat)
+        report("textes, sentiments en cache", seconds, peak)
+        specs = [GraphSpec(kind=GraphCache.KIND_GRADES, title=numanswer.questiontext, data=gradesdata(numanswer))
+                 for numanswer in numanswers] + \
+                [GraphSpec(kind=GraphCache.KIND_SENTIMENTS, title=textanswer.questiontext,
+                           data={"polarities": textanswer.polarities, "subjectivities": textanswer.subjectivities})
+                 for textanswer in textanswers]
+        graphpaths, seconds, peak = measure(lambda: GraphCache.getgraphs(specs), repeat=args.repeat, before=cleargraphs)
+        report(f"{len(specs)} graphiques dessinés", seconds, peak)
+        graphpaths, seconds, peak = measure(lambda: GraphCache.getgraphs(specs), repeat=args.repeat)
+        report(f"{len(specs)} graphiques en cache", seconds, peak)
+        errors = [message for message in get_flashed_messages() if message.startswith("Erreur")]
+
+    client = app.test_client()
+    with client.session_transaction() as clientsession:
+        clientsession.update(criteria)
+    response, seconds, peak = measure(lambda: client.get("/dashboard/analyze"), repeat=args.repeat)
+    report("page complète (caches pleins)", seconds, peak)
+    for message in errors[:5]:
+        print(f"    {message}")
+    return 0 if response.status_code == 200 and not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Synthetic dataset : courses, students, forms (one per week), questions and answers.
+
+Grades from 1 to 5 and French free text answers built from common feedback phrases, inserted by
+batches of core INSERT statements (5M answers take a few minutes with SQLite). Repeatable : the same
+arguments and seed give the same data.
+
+    python benchmarks/dataset.py --dburi sqlite:////tmp/dataset.db [--courses 10] [--students 100] ...
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from benchutils import usedatabase
+
+OPENINGS = ["Très bon cours", "Cours intéressant", "Formateur très pédagogue", "Rythme un peu trop rapide",
+            "Exercices pertinents", "Contenu trop théorique", "Bonne ambiance dans le groupe",
+            "Explications parfois confuses", "Supports de cours clairs", "Manque de pratique",
+            "Semaine difficile", "Excellent module", "Pas assez de temps pour les exercices",
+            "Intervenant passionnant", "Cours ennuyeux"]
+CONNECTORS = [", ", " mais ", " et ", ". ", " : "]
+ENDINGS = ["j'ai beaucoup appris", "il faudrait plus d'exemples concrets", "les TP étaient trop longs",
+           "merci pour la disponibilité", "la salle était trop bruyante", "le projet final était motivant",
+           "certaines notions restent floues", "rien à redire", "j'aurais aimé plus de travail en groupe",
+           "les corrections étaient utiles", "le niveau était trop élevé pour moi", "vivement la suite"]
+NUM_QUESTIONS = ["Note globale de la semaine", "Qualité des supports", "Rythme de la formation",
+                 "Pédagogie du formateur", "Intérêt des exercices"]
+TEXT_QUESTIONS = ["Qu'avez-vous pensé de la semaine ?", "Que faudrait-il améliorer ?", "Commentaires libres"]
+GRADE_WEIGHTS = [5, 10, 20, 35, 30]  # grades 1 to 5
+BATCH_SIZE = 10000
+
+
+def freetext(rand: random.Random) -> str:
+    res = rand.choice(OPENINGS)
+    if rand.random() < 0.7:
+        res += rand.choice(CONNECTORS) + rand.choice(ENDINGS)
+    return res
+
+
+def questiontext(texts: list, num: int) -> str:
+    return texts[num % len(texts)] + ("" if num < len(texts) else f" ({num + 1})")
+
+
+def generate(courses: int, students: int, forms: int, numquestions: int = 3, textquestions: int = 2,
+             responserate: float = 0.85, seed: int = 0) -> dict:
+    # students and forms per course, every student answers all the questions of a form with the response rate.
+    # To be called in an application context, on empty tables (ids are given)
+    from app import db
+    from app.database.dbutils import DbFormStat
+    from app.database.models import Answer, Course, Form, Question, Student
+    rand = random.Random(seed)
+    counts = dict(courses=0, students=0, forms=0, questions=0, answers=0)
+    answers = list()
+
+    def insert(model, rows: list):
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+            counts[model.__tablename__.lower()] += len(rows)
+            rows.clear()
+
+    studentid, formid, questionid = 0, 0, 0
+    for coursenum in range(courses):
+        courseid = coursenum + 1
+        startdate = datetime(2019, 1, 7) + timedelta(weeks=coursenum * 2)
+        insert(Course, [dict(id=courseid, label=f"Formation {courseid}", startdate=startdate,
+                             enddate=startdate + timedelta(weeks=forms), fileid=f"dataset-file-{courseid}",
+                             filename=f"Réponses formation {courseid}", filetz="Europe/Paris")])
+        studentids = list(range(studentid + 1, studentid + students + 1))
+        studentid += students
+        insert(Student, [dict(id=sid, lastname=f"Nom{sid}", firstname=f"Prénom{sid}",
+                              email=f"etudiant{sid}@gmail.com", course_id=courseid) for sid in studentids])
+        numids = list(range(questionid + 1, questionid + numquestions + 1))
+        textids = list(range(questionid + numquestions + 1, questionid + numquestions + textquestions + 1))
+        questionid += numquestions + textquestions
+        insert(Question, [dict(id=qid, isint="Y", text=questiontext(NUM_QUESTIONS, num), course_id=courseid)
+                          for num, qid in enumerate(numids)] +
+               [dict(id=qid, isint="N", text=questiontext(TEXT_QUESTIONS, num), course_id=courseid)
+                for num, qid in enumerate(textids)])
+        questions = [(qid, True) for qid in numids] + [(qid, False) for qid in textids]
+        for formnum in range(forms):
+            formid += 1
+            weekstart = startdate + timedelta(weeks=formnum)
+            lastentrydt = weekstart
+            for sid in studentids:
+                if rand.random() >= responserate:
+                    continue
+                timestamp = weekstart + timedelta(days=4, minutes=rand.randrange(3 * 24 * 60))
+                lastentrydt = max(lastentrydt, timestamp)
+                for qid, isint in questions:
+                    text = str(rand.choices(range(1, 6), weights=GRADE_WEIGHTS)[0]) if isint else freetext(rand)
+                    answers.append(dict(timestamp=timestamp, text=text, form_id=formid, student_id=sid,
+                                        question_id=qid))
+            # answers after their form (foreign key)
+            insert(Form, [dict(id=formid, sheetid=formid, sheetlabel=f"Semaine {formnum + 1}",
+                               lastentrydt=lastentrydt, lastreaddt=lastentrydt + timedelta(days=1),
+                               course_id=courseid)])
+            if len(answers) >= BATCH_SIZE:
+                insert(Answer, answers)
+    insert(Answer, answers)
+    # forms statistics, as maintained by the synchronization
+    DbFormStat.rebuild()
+    db.session.commit()
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dburi", required=True, help="database to fill, its tables are dropped")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--students", type=int, default=100, help="students per course")
+    parser.add_argument("--forms", type=int, default=20, help="forms (weeks) per course")
+    parser.add_argument("--numquestions", type=int, default=3, help="grade questions per course")
+    parser.add_argument("--textquestions", type=int, default=2, help="free text questions per course")
+    parser.add_argument("--responserate", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    usedatabase(args.dburi)
+    from app import app, db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        counts = generate(courses=args.courses, students=args.students, forms=args.forms,
+                          numquestions=args.numquestions, textquestions=args.textquestions,
+                          responserate=args.responserate, seed=args.seed)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
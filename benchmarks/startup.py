@@ -0,0 +1,76 @@
+"""Cold start benchmark : import time of the application and of its first request.
+
+Runs the application in a fresh interpreter with ``python -X importtime``, reports the import time
+of the slowest packages and fails (exit code 1) when the cold start exceeds the budget or when
+a library only needed by the dashboard or the sentiment analysis is loaded at startup.
+
+    python benchmarks/startup.py [--budget 3.0] [--top 15] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# loaded on first use only, see GraphCache.draw and SentimentAnalyzer.inittools
+LAZY_MODULES = ["matplotlib", "pandas", "plotnine", "textblob", "textblob_fr", "nltk"]
+CHILD = """
+import sys, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+app.config["TESTING"] = True
+app.test_client().get("/")
+responded = time.perf_counter()
+print(imported - start, responded - imported)
+print("loaded:" + ",".join(name for name in {lazy!r} if name in sys.modules))
+"""
+
+
+def runchild() -> Tuple[float, float, List[str], Dict[str, int]]:
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD.format(lazy=LAZY_MODULES)],
+                               cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.exit(completed.stderr)
+    lines = completed.stdout.strip().splitlines()
+    importsec, requestsec = (float(value) for value in lines[-2].split())
+    loaded = [name for name in lines[-1][len("loaded:"):].split(",") if name]
+    # self time of each imported module, summed by top level package
+    packages = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        selfus, _, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(selfus)
+    return importsec, requestsec, loaded, packages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=3.0, help="maximum cold start in seconds (import + first request)")
+    parser.add_argument("--top", type=int, default=15, help="number of packages reported")
+    parser.add_argument("--runs", type=int, default=3, help="the fastest run is kept")
+    args = parser.parse_args()
+
+    runs = [runchild() for _ in range(args.runs)]
+    importsec, requestsec, loaded, packages = min(runs, key=lambda run: run[0] + run[1])
+    print(f"{'package':<30}{'import (ms)':>12}")
+    for name, selfus in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<30}{selfus / 1000:>12.1f}")
+    total = importsec + requestsec
+    print(f"\nimport app : {importsec:.3f} s, first request : {requestsec:.3f} s, "
+          f"cold start : {total:.3f} s (budget {args.budget:.3f} s)")
+    failed = False
+    if loaded:
+        print(f"FAILED : loaded at startup : {', '.join(loaded)}")
+        failed = True
+    if total > args.budget:
+        print("FAILED : cold start over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Synchronization benchmark : DbForm.updateall against a local stand-in of the Google API.
+
+Creates N courses whose files hold M tabs of R answers (app.api.fakegspread), each API call waiting
+--latency seconds, in a temporary SQLite database (or --dburi). Then measures wall time, API calls and
+database statements of three synchronizations : first read, nothing changed, rows appended to every tab.
+
+    python benchmarks/sync.py [--courses 3] [--tabs 10] [--rows 100] [--latency 0.1] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchutils import usedatabase
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=3)
+    parser.add_argument("--tabs", type=int, default=10, help="tabs (forms) per course file")
+    parser.add_argument("--rows", type=int, default=100, help="answers (students) per tab")
+    parser.add_argument("--questions", type=int, default=5, help="questions per form")
+    parser.add_argument("--appended", type=int, default=5, help="rows added to every tab before the last sync")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds waited by each API call")
+    parser.add_argument("--workers", type=int, default=None, help="SYNC_WORKERS, default from the config")
+    parser.add_argument("--dburi", default=None, help="database to use instead of a temporary SQLite file, "
+                                                      "its tables are dropped")
+    args = parser.parse_args()
+
+    folder = tempfile.TemporaryDirectory()
+    usedatabase(args.dburi or "sqlite:///" + os.path.join(folder.name, "benchmark.db"))
+    from sqlalchemy import event
+    from flask import get_flashed_messages
+    from app import app, db
+    from app.api.apiutils import ApiClient
+    from app.api.fakegspread import FakeClient
+    from app.apputils import Const
+    from app.database.dbutils import DbForm
+    from app.database.models import Course, Student
+
+    if args.workers is not None:
+        app.config["SYNC_WORKERS"] = args.workers
+    client, emailsdict = FakeClient.generate(courses=args.courses, tabs=args.tabs, rows=args.rows,
+                                             questions=args.questions, latency=args.latency)
+    ApiClient.setclient(client)
+    statements = Counter()
+
+    with app.test_request_context():
+        db.drop_all()
+        db.create_all()
+        for coursenum, (key, emails) in enumerate(emailsdict.items()):
+            course = Course(label=f"Formation {coursenum}", startdate=datetime(2019, 1, 1),
+                            enddate=datetime(2100, 1, 1), fileid=key, filename=client.spreadsheets[key].title,
+                            filetz="Europe/Paris")
+            course.students = [Student(lastname=f"Nom {num}", firstname="Prénom", email=email)
+                               for num, email in enumerate(emails)]
+            db.session.add(course)
+        db.session.commit()
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def countstatement(conn, cursor, statement, parameters, context, executemany):
+            statements[statement.split(None, 1)[0].upper()] += 1
+
+        print(f"{args.courses} formation(s) x {args.tabs} onglet(s) x {args.rows} ligne(s), "
+              f"{args.questions} question(s), latence {args.latency * 1000:.0f} ms, "
+              f"{app.config.get('SYNC_WORKERS', Const.DEFAULT_SYNC_WORKERS)} worker(s)")
+        print(f"{'synchronisation':<16}{'durée (s)':>10}{'lignes':>9}{'appels API':>12}{'requêtes BD':>13}"
+              f"{'erreurs':>9}   détail API / BD")
+        for scenario in ["initiale", "inchangée", "ajouts"]:
+            if scenario == "ajouts":
+                for spreadsheet in client.spreadsheets.values():
+                    emails = emailsdict[spreadsheet.id]
+                    for wsheet in spreadsheet.wsheets:
+                        lastdt = datetime.strptime(wsheet.rows[-1][0], "%d/%m/%Y %H:%M:%S")
+                        for rownum in range(args.appended):
+                            wsheet.rows.append([(lastdt + timedelta(minutes=rownum + 1)).strftime("%d/%m/%Y %H:%M:%S"),
+                                                emails[rownum % len(emails)]] + wsheet.rows[-1][2:])
+            callsbefore = client.stats.calls.copy()
+            statements.clear()
+            start = time.perf_counter()
+            success, reports = DbForm.updateall(minenddate=datetime(2000, 1, 1), daysnochange=100000)
+            seconds = time.perf_counter() - start
+            calls = client.stats.calls - callsbefore
+            errors = [message for message in get_flashed_messages() if message.startswith("Erreur")]
+            errors += [report.message for report in reports if not report.success and report.message]
+            print(f"{scenario:<16}{seconds:>10.2f}{sum(report.rowscount for report in reports):>9}"
+                  f"{sum(calls.values()):>12}{sum(statements.values()):>13}{len(errors):>9}   "
+                  f"{dict(calls)} / {dict(statements)}")
+            for message in errors[:5]:
+                print(f"    {message}")
+            if not success or errors:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())